@@ -86,10 +86,12 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # For serving static files in production
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'shop.middleware.SlidingSessionMiddleware',  # Re-save sessions only when the expiry needs refreshing
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'shop.middleware.GuestCartMiddleware',  # Guest carts keyed by a signed cookie (no User rows)
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -128,6 +130,27 @@ DATABASES = {
 }
 
 
+# Cache
+# Local memory by default (one cache per worker); point CACHE_BACKEND/CACHE_LOCATION
+# at a shared backend (e.g. Redis or Memcached) so workers share cached entries.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'edithcloths'),
+    }
+}
+
+# Seconds a public catalog response (products, categories, banners, settings) stays cached.
+# Entries are keyed on per-endpoint versions in the database, bumped on every catalog change.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '60'))
+
+# Seconds the admin dashboard figures stay cached; order changes invalidate them sooner.
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', '60'))
+
+# Storage name -> media URL entries kept in memory per process (see shop/media.py).
+MEDIA_URL_CACHE_SIZE = int(os.environ.get('MEDIA_URL_CACHE_SIZE', '4096'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -250,6 +273,10 @@ REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
 }
 
+# Cursor pagination for product, order and user listings (opt-in via ?page_size= / ?cursor=)
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', '20'))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', '100'))
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -286,6 +313,12 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Let the frontend read the catalog validators for conditional polling
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'last-modified',
+]
+
 # Production: Only allow specific origins
 # Development: Allow all origins (when DEBUG=True)
 if DEBUG:
@@ -401,7 +434,21 @@ if not BASE_URL and not DEBUG:
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'None' if not DEBUG else 'Lax'  # Allow cross-origin requests in production (needed for Vercel frontend)
 SESSION_COOKIE_AGE = 60 * 60 * 24 * 7  # 7 days
-SESSION_SAVE_EVERY_REQUEST = True  # Save session on every request to keep it alive
+# cached_db serves session reads from the cache and writes through to the database, which is
+# only safe with a cache every worker shares: with the per-process local-memory default a worker
+# could keep serving a session another worker has changed or logged out, so use plain db there.
+SESSION_ENGINE = os.environ.get(
+    "SESSION_ENGINE",
+    "django.contrib.sessions.backends.db"
+    if CACHES['default']['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache'
+    else "django.contrib.sessions.backends.cached_db",
+)
+SESSION_SAVE_EVERY_REQUEST = False  # SlidingSessionMiddleware keeps active sessions alive instead
+SESSION_REFRESH_FRACTION = float(os.environ.get("SESSION_REFRESH_FRACTION", "0.25"))  # Refresh after 25% of the age
+
+# Guest carts: a signed cookie holds the cart key; it expires this long after the last cart activity
+GUEST_CART_COOKIE_NAME = 'guest_cart'
+GUEST_CART_AGE = int(os.environ.get("GUEST_CART_AGE", 60 * 60 * 24 * 30))  # 30 days
 
 # CSRF settings for cross-origin support
 CSRF_COOKIE_HTTPONLY = False  # Allow JavaScript to read CSRF token (needed for some frontend frameworks)
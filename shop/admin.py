@@ -4,10 +4,6 @@ from django.shortcuts import render, redirect
 from django.http import HttpResponseRedirect
 from django.utils.html import format_html
 from django.contrib import messages
-from django.db.models import Count, Sum, Q, F
-from django.utils import timezone
-from datetime import timedelta
-from django.contrib.auth.models import User
 from .models import (
     Category,
     Product,
@@ -16,11 +12,11 @@ from .models import (
     Banner,
     Cart,
     CartItem,
-    Order,
     OrderItem,
     PaymentProof,
     SiteSettings,
 )
+from .orders import mark_orders_paid, set_orders_status, cancel_orders, dashboard_stats
 
 # Note: Admin site customization is now in edithclothes/admin.py (CustomAdminSite)
 # This file uses the default admin.site for model registration
@@ -101,6 +97,10 @@ class CartAdmin(admin.ModelAdmin):
     list_display = ('user', 'total_items', 'total_amount', 'created_at')
     inlines = [CartItemInline]
 
+    def get_queryset(self, request):
+        # Totals come from annotations instead of two queries per row
+        return super().get_queryset(request).select_related('user').with_totals()
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -114,19 +114,32 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('order_number', 'user__username', 'user__email')
     readonly_fields = ('order_number', 'created_at', 'updated_at')
     inlines = [OrderItemInline]
-    actions = ['verify_payment']
+    actions = ['verify_payment', 'mark_shipped', 'mark_delivered', 'cancel_selected']
+
+    def report(self, request, results, verb):
+        updated = sum(1 for item in results if item['result'] == 'updated')
+        self.message_user(request, f"{verb} {updated} order(s); {len(results) - updated} left unchanged.")
 
     def verify_payment(self, request, queryset):
-        for order in queryset:
-            order.payment_verified = True
-            order.status = 'PAYMENT_VERIFIED'
-            order.save()
-            if hasattr(order, 'payment_proof'):
-                order.payment_proof.verified = True
-                order.payment_proof.save()
-        self.message_user(request, f"Payment verified for {queryset.count()} order(s).")
+        ids = list(queryset.values_list('pk', flat=True))
+        self.report(request, mark_orders_paid(ids, status='PAYMENT_VERIFIED'), "Payment verified for")
     verify_payment.short_description = "Verify payment for selected orders"
 
+    def mark_shipped(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        self.report(request, set_orders_status(ids, 'SHIPPED'), "Marked as shipped")
+    mark_shipped.short_description = "Mark selected orders as shipped"
+
+    def mark_delivered(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        self.report(request, set_orders_status(ids, 'DELIVERED'), "Marked as delivered")
+    mark_delivered.short_description = "Mark selected orders as delivered"
+
+    def cancel_selected(self, request, queryset):
+        ids = list(queryset.values_list('pk', flat=True))
+        self.report(request, cancel_orders(ids), "Cancelled")
+    cancel_selected.short_description = "Cancel selected orders"
+
 
 # Models are now registered in edithclothes/urls.py with CustomAdminSite
 # Keep these for backward compatibility but they won't be used
@@ -143,49 +156,5 @@ def dashboard_view(request):
         messages.error(request, "You don't have permission to access this page.")
         return redirect('admin:index')
 
-    # Calculate statistics
-    total_orders = Order.objects.count()
-    completed_orders = Order.objects.filter(status='DELIVERED').count()
-    pending_orders = Order.objects.filter(
-        Q(status='PLACED') | Q(status='PAYMENT_PENDING') | Q(status='PAYMENT_VERIFIED')
-    ).count()
-    cancelled_orders = Order.objects.filter(status='CANCELLED').count()
-    total_users = User.objects.count()
-    total_revenue = Order.objects.filter(
-        payment_verified=True
-    ).aggregate(total=Sum('total_amount'))['total'] or 0
-
-    # Recent orders
-    recent_orders = Order.objects.select_related('user').order_by('-created_at')[:10]
-
-    # Order status breakdown
-    status_breakdown = Order.objects.values('status').annotate(count=Count('id'))
-
-    # Revenue by month (last 6 months)
-    monthly_revenue = []
-    for i in range(5, -1, -1):
-        month = timezone.now() - timedelta(days=30 * i)
-        month_start = month.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        next_month = (month_start + timedelta(days=32)).replace(day=1)
-        revenue = Order.objects.filter(
-            payment_verified=True,
-            created_at__gte=month_start,
-            created_at__lt=next_month
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        monthly_revenue.append({
-            'month': month_start.strftime('%b %Y'),
-            'revenue': float(revenue)
-        })
-
-    context = {
-        'total_orders': total_orders,
-        'completed_orders': completed_orders,
-        'pending_orders': pending_orders,
-        'cancelled_orders': cancelled_orders,
-        'total_users': total_users,
-        'total_revenue': float(total_revenue),
-        'recent_orders': recent_orders,
-        'status_breakdown': status_breakdown,
-        'monthly_revenue': monthly_revenue,
-    }
+    context = dashboard_stats()
     return render(request, 'admin/dashboard.html', context)
@@ -0,0 +1,168 @@
+"""
+Response caching for the public catalog endpoints.
+
+Two layers live here:
+
+* ``catalog_conditional`` answers conditional GETs (If-None-Match) with
+  304 from a single primary key lookup, before any serialization happens.
+* ``catalog_cached`` keeps the serialized payload in the Django cache.
+
+Both are built from the endpoint's fingerprint: the version of its scope
+(products, categories, banners or settings) in the CatalogVersion table,
+read once per request. Signals bump the version whenever catalog data is
+saved or deleted, and ``refresh_product_listings`` after any product,
+variant, image or stock change (see shop/signals.py). Cached payloads are
+keyed by the same hash the ETag is made of, so a body is only ever served
+with the ETag of the data it was built from; old entries expire on their
+own.
+
+Because the versions live in the database, invalidation reaches every
+gunicorn worker even with the local-memory backend; a shared backend in
+CACHES only saves each worker from building its own copy.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from rest_framework.response import Response
+
+from .models import CatalogVersion
+
+
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Key missing (first use or evicted)
+        cache.add(key, 1, timeout=None)
+        return 1
+
+
+def catalog_cache_stats():
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+        'backend': settings.CACHES['default']['BACKEND'],
+    }
+
+
+def catalog_fingerprint(request, fingerprint):
+    """Run ``fingerprint`` once per request; the ETag and the cache key both use this result"""
+    if not hasattr(request, '_catalog_fingerprint'):
+        request._catalog_fingerprint = fingerprint()
+    return request._catalog_fingerprint
+
+
+def catalog_digest(request, endpoint, fingerprint, params=None):
+    """Hash of the endpoint, query params, scheme/host and data fingerprint of a request"""
+    values = sorted((key, str(value)) for key, value in catalog_fingerprint(request, fingerprint).items())
+    vary = sorted((params or {}).items())
+    raw = f"{endpoint}|{request.scheme}://{request.get_host()}|{vary}|{values}"
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+def catalog_cache_key(request, endpoint, fingerprint, params=None):
+    return f"catalog:{endpoint}:{catalog_digest(request, endpoint, fingerprint, params)}"
+
+
+def catalog_cached(endpoint, fingerprint, vary_on=None):
+    """
+    Cache the data of a successful GET response for a catalog endpoint.
+
+    ``vary_on`` receives the request and returns the normalized query params
+    that change the payload (e.g. gender for the product list). The key
+    includes the same ``fingerprint`` the ETag is built from, so a cached
+    body always matches the ETag it is served with.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            params = vary_on(request) if vary_on else None
+            key = catalog_cache_key(request, endpoint, fingerprint, params)
+            data = cache.get(key)
+            if data is not None:
+                _incr(HITS_KEY)
+                response = Response(data)
+                response['X-Catalog-Cache'] = 'HIT'
+                return response
+
+            _incr(MISSES_KEY)
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout=getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60))
+            response['X-Catalog-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def catalog_version(scope):
+    """Current CatalogVersion of ``scope`` (0 before its first change): one primary key lookup"""
+    return CatalogVersion.objects.filter(scope=scope).values_list('version', flat=True).first() or 0
+
+
+def bump_catalog_version(*scopes):
+    """
+    Invalidate the cached responses of the given scopes in every worker.
+
+    Run it in the transaction that changes the data (signals do), or right
+    after it commits (``refresh_product_listings`` does).
+    """
+    now = timezone.now()
+    for scope in scopes:
+        versions = CatalogVersion.objects.filter(scope=scope)
+        if not versions.update(version=F('version') + 1, updated_at=now):
+            _, created = CatalogVersion.objects.get_or_create(scope=scope, defaults={'version': 1})
+            if not created:
+                versions.update(version=F('version') + 1, updated_at=now)
+
+
+def product_fingerprint():
+    return {'version': catalog_version('products')}
+
+
+def category_fingerprint():
+    return {'version': catalog_version('categories')}
+
+
+def banner_fingerprint():
+    return {'version': catalog_version('banners')}
+
+
+def settings_fingerprint():
+    return {'version': catalog_version('settings')}
+
+
+def catalog_conditional(endpoint, fingerprint, vary_on=None):
+    """
+    Conditional GET support (weak ETag) for a catalog view method.
+
+    ``fingerprint`` runs one query, shared with ``catalog_cached``; clients
+    holding a fresh copy get a 304 without the view (or the response cache)
+    ever running. There is deliberately no Last-Modified: the ETag is what
+    changes with every save and delete.
+    """
+    def etag_func(request, *args, **kwargs):
+        params = vary_on(request) if vary_on else None
+        return 'W/"%s"' % catalog_digest(request, endpoint, fingerprint, params)
+
+    conditional = condition(etag_func=etag_func)
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            response = conditional(lambda req, *a, **kw: view_method(view, req, *a, **kw))(request, *args, **kwargs)
+            # Let browsers keep the body but revalidate with the ETag every time
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+    return decorator
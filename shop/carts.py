@@ -0,0 +1,58 @@
+"""
+Cart services shared by the template login/signup pages and the JWT API.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Cart, CartItem
+
+
+def merge_carts(source_carts, user):
+    """
+    Move the items of ``source_carts`` into ``user``'s cart, adding up quantities
+    of variants that are already there.
+
+    Runs in one transaction and a constant number of queries however many
+    items are moved: one locked read, one ``bulk_update`` for the summed
+    quantities, one UPDATE reassigning the rest and one DELETE for the
+    merged duplicates. Source carts are left empty; the caller decides
+    whether to delete them.
+    """
+    with transaction.atomic():
+        user_cart, _ = Cart.objects.get_or_create(user=user)
+        source_ids = [cart.pk for cart in source_carts if cart.pk != user_cart.pk]
+        if not source_ids:
+            return user_cart
+
+        items = list(
+            CartItem.objects.select_for_update().filter(cart_id__in=[user_cart.pk, *source_ids]).order_by('pk')
+        )
+        kept = {item.variant_id: item for item in items if item.cart_id == user_cart.pk}
+        changed = {}
+        moved = []
+        merged = []
+        for item in items:
+            if item.cart_id == user_cart.pk:
+                continue
+            target = kept.get(item.variant_id)
+            if target is None:
+                kept[item.variant_id] = item
+                moved.append(item.pk)
+            else:
+                target.quantity += item.quantity
+                changed[target.pk] = target
+                merged.append(item.pk)
+
+        if not moved and not merged:
+            return user_cart
+
+        now = timezone.now()
+        for item in changed.values():
+            item.updated_at = now
+        CartItem.objects.bulk_update(changed.values(), ['quantity', 'updated_at'])
+        if moved:
+            CartItem.objects.filter(pk__in=moved).update(cart=user_cart, updated_at=now)
+        if merged:
+            CartItem.objects.filter(pk__in=merged).delete()
+        user_cart.bump_version()
+    return user_cart
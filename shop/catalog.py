@@ -0,0 +1,334 @@
+"""
+Catalog helpers that work purely on prefetched relations.
+
+The product listing used to issue several queries per product (and per color)
+to work out colors, prices, stock and images. Everything here expects the
+querysets built by ``listing_queryset`` so the whole page is assembled from
+objects already in memory and the query count stays constant.
+
+The per-color expansion (``product_color_rows``) feeds the denormalized
+ProductListing table, which ``/api/products/?expand_by_color=true`` reads
+with a single indexed scan.
+Signals (shop/signals.py) keep it current per product, refreshing each
+changed product once when its transaction commits;
+``manage.py rebuild_product_listings`` rebuilds it in full.
+
+Which image represents a product or a color is decided once, by
+``refresh_primary_images``, and stored as ``primary_image`` pointers that
+every thumbnail (listing, cards, order snapshots) is read through.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Prefetch
+from django.utils import timezone
+
+from .caching import bump_catalog_version
+from .images import rendition_name
+from .media import media_url
+from .models import Product, ProductVariant, ProductImage, ProductListing
+
+
+# Columns a card needs; everything else (description, flags, ...) stays in the database
+CARD_COLUMNS = ('id', 'title', 'slug', 'base_price', 'gender', 'hero_media', 'created_at')
+
+# ProductSerializer fields backed by a differently named model field
+PRODUCT_FIELD_SOURCES = {
+    'name': 'title',
+    'hero_media_url': 'hero_media',
+}
+
+
+def product_queryset():
+    """Products with every relation the listing and ProductSerializer read"""
+    return (
+        Product.objects.select_related('category', 'primary_image')
+        .prefetch_related(
+            Prefetch('variants', queryset=ProductVariant.objects.select_related('primary_image')),
+            'variants__images',
+            'images',
+        )
+    )
+
+
+def listing_queryset():
+    """Active products with every relation the color expansion needs"""
+    return product_queryset().filter(is_active=True)
+
+
+def sparse_listing_queryset(fields):
+    """
+    Active products loading only the columns and relations behind ``fields``.
+
+    Used for ``/api/products/?fields=...`` so unrequested relations are
+    never prefetched and unrequested columns never leave the database.
+    """
+    concrete = {field.name for field in Product._meta.concrete_fields}
+    columns = {'id', 'created_at'}
+    for name in fields:
+        source = PRODUCT_FIELD_SOURCES.get(name, name)
+        if source in concrete:
+            columns.add(source)
+
+    if 'variants' in fields:
+        # ProductVariantSerializer reads these through variant.product
+        columns.update(('title', 'base_price', 'hero_media'))
+
+    queryset = Product.objects.filter(is_active=True)
+    if 'category' in fields:
+        queryset = queryset.select_related('category')
+    prefetch = []
+    if 'variants' in fields:
+        prefetch.append('variants__images')
+        # Variant images fall back to product-level images
+        prefetch.append('images')
+    elif 'images' in fields:
+        prefetch.append('images')
+    return queryset.prefetch_related(*prefetch).only(*columns)
+
+
+def card_queryset():
+    """
+    Active products for the compact card view, in a single query.
+
+    Stock is annotated with a subquery and the thumbnail path and renditions
+    are read through the primary_image pointer instead of loading variants
+    and images.
+    """
+    return (
+        Product.objects.filter(is_active=True)
+        .only(*CARD_COLUMNS)
+        .annotate(
+            has_stock=Exists(ProductVariant.objects.filter(product=OuterRef('pk'), stock__gt=0)),
+            thumbnail=F('primary_image__image'),
+            thumbnail_renditions=F('primary_image__renditions'),
+        )
+    )
+
+
+def sorted_variants(product):
+    """Prefetched variants in primary key order (matches ``.first()`` on the relation)"""
+    return sorted(product.variants.all(), key=lambda variant: variant.pk)
+
+
+def product_image_file(product):
+    """Product hero media, otherwise its primary image (a FieldFile)"""
+    if product.hero_media:
+        return product.hero_media
+    if product.primary_image_id and product.primary_image.image:
+        return product.primary_image.image
+    return None
+
+
+def color_image_file(product, variant):
+    """Primary image of a color variant, falling back to the product image"""
+    if variant.primary_image_id and variant.primary_image.image:
+        return variant.primary_image.image
+    return product_image_file(product)
+
+
+def grid_image_name(file):
+    """Storage name a listing grid shows for ``file``: its card-size rendition when it has one"""
+    if not file:
+        return ''
+    if isinstance(file.instance, ProductImage):
+        return rendition_name(file.instance.renditions) or file.name
+    return file.name
+
+
+def refresh_primary_images(product_ids):
+    """
+    Recompute ``primary_image`` of the given products and their variants.
+
+    A variant points at its image flagged primary, else its first image
+    (by display order). A product points at its first product-level image,
+    else at the image of its first variant. Hero media is a separate field
+    and still takes precedence where a product image is shown.
+
+    Three reads, then one UPDATE for whichever rows actually changed.
+    """
+    if not product_ids:
+        return
+    variant_best = {}
+    product_level = {}
+    for pk, product_id, variant_id, is_primary in (
+        ProductImage.objects.filter(product_id__in=product_ids)
+        .order_by('display_order', 'created_at', 'pk')
+        .values_list('pk', 'product_id', 'variant_id', 'is_primary')
+    ):
+        if variant_id is None:
+            product_level.setdefault(product_id, pk)
+        elif variant_id not in variant_best or (is_primary and not variant_best[variant_id][1]):
+            variant_best[variant_id] = (pk, is_primary)
+
+    # bulk_update skips auto_now
+    now = timezone.now()
+    changed_variants = []
+    first_variant_image = {}
+    for pk, product_id, current in (
+        ProductVariant.objects.filter(product_id__in=product_ids)
+        .order_by('pk')
+        .values_list('pk', 'product_id', 'primary_image_id')
+    ):
+        best = variant_best.get(pk, (None, False))[0]
+        first_variant_image.setdefault(product_id, best)
+        if best != current:
+            changed_variants.append(ProductVariant(pk=pk, primary_image_id=best, updated_at=now))
+
+    changed_products = []
+    for pk, current in Product.objects.filter(pk__in=product_ids).values_list('pk', 'primary_image_id'):
+        best = product_level.get(pk, first_variant_image.get(pk))
+        if best != current:
+            changed_products.append(Product(pk=pk, primary_image_id=best, updated_at=now))
+
+    # bulk_update sends no signals, so this never re-enters the image receivers
+    with transaction.atomic():
+        ProductVariant.objects.bulk_update(changed_variants, ['primary_image', 'updated_at'])
+        Product.objects.bulk_update(changed_products, ['primary_image', 'updated_at'])
+
+
+def product_color_rows(product):
+    """
+    One row per color of a product (or a single row if it has no variants).
+
+    Rows carry the image as a FieldFile; ``refresh_product_listings`` stores
+    the name of its grid-size rendition.
+    """
+    variants = sorted_variants(product)
+
+    if not variants:
+        # No variants, show product as-is with base price
+        return [{
+            'color': None,
+            'title': product.title,
+            'price': product.base_price,
+            'image': product_image_file(product),
+            'has_stock': False,
+        }]
+
+    # Group variants by color, keeping the order in which colors first appear
+    by_color = {}
+    for variant in variants:
+        by_color.setdefault(variant.color, []).append(variant)
+
+    rows = []
+    for color, color_variants in by_color.items():
+        # First variant with this color determines price and image
+        first_variant = color_variants[0]
+        rows.append({
+            'color': color,
+            'title': f"{product.title} - {color}",
+            'price': first_variant.price,
+            'image': color_image_file(product, first_variant),
+            'has_stock': any(variant.stock > 0 for variant in color_variants),
+        })
+    return rows
+
+
+def listing_entry(product_id, title, base_title, color, price, image_url, category, slug, gender, has_stock):
+    """The JSON shape of one ``expand_by_color`` entry"""
+    entry = {
+        'product_id': product_id,
+        'title': title,
+    }
+    if color is not None:
+        entry['base_title'] = base_title  # Keep original title
+    entry.update({
+        'color': color,
+        'price': float(price),
+        'image_url': image_url,
+        'category': category,
+        'slug': slug,
+        'gender': gender,
+        'has_stock': has_stock,
+    })
+    return entry
+
+
+def listing_rows_queryset():
+    """Rows of the denormalized listing for active products"""
+    return ProductListing.objects.filter(is_active=True)
+
+
+def serialize_listing_rows(rows, request=None):
+    """Turn ProductListing rows into ``expand_by_color`` entries without touching other tables"""
+    storage = ProductImage._meta.get_field('image').storage
+    entries = []
+    for row in rows:
+        entries.append(listing_entry(
+            row.product_id, row.title, row.base_title, row.color, row.price,
+            media_url(row.image, request, storage=storage),
+            {'id': row.category_id, 'name': row.category_name, 'slug': row.category_slug},
+            row.slug, row.gender, row.has_stock,
+        ))
+    return entries
+
+
+# Products whose primary images and listing rows are refreshed when the
+# current transaction commits.
+_pending = threading.local()
+
+
+def schedule_catalog_refresh(product_ids):
+    """
+    Refresh the primary images and listing rows of these products once the
+    current transaction commits, however many of their variants and images
+    change in it. Outside a transaction this runs immediately.
+    """
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = set()
+    _pending.ids.update(product_ids)
+    # Later callbacks in the same commit find the set already drained
+    transaction.on_commit(flush_catalog_refresh, robust=True)
+
+
+def flush_catalog_refresh():
+    product_ids = getattr(_pending, 'ids', set())
+    _pending.ids = set()
+    if product_ids:
+        refresh_primary_images(product_ids)
+        refresh_product_listings(product_ids)
+
+
+def refresh_product_listings(product_ids):
+    """
+    Recompute the ProductListing rows of the given products.
+
+    Only the rows of these products are touched; deleted products simply
+    lose their rows. The product rows are locked first, in primary key
+    order, so concurrent refreshes of the same product take turns instead
+    of racing on the (product, position) unique constraint.
+    """
+    if not product_ids:
+        return
+    with transaction.atomic():
+        list(Product.objects.select_for_update().filter(pk__in=product_ids).order_by('pk').values_list('pk'))
+        ProductListing.objects.filter(product_id__in=product_ids).delete()
+        ProductListing.objects.bulk_create(listing_rows(product_ids))
+        # Every product, variant, image and stock change ends up here
+        bump_catalog_version('products')
+
+
+def listing_rows(product_ids):
+    """Unsaved ProductListing rows for the given products, read after they are locked"""
+    rows = []
+    for product in product_queryset().filter(pk__in=product_ids):
+        for position, row in enumerate(product_color_rows(product)):
+            rows.append(ProductListing(
+                product=product,
+                position=position,
+                color=row['color'],
+                title=row['title'],
+                base_title=product.title,
+                price=row['price'],
+                image=grid_image_name(row['image']),
+                has_stock=row['has_stock'],
+                category_id=product.category_id,
+                category_name=product.category.name,
+                category_slug=product.category.slug,
+                slug=product.slug,
+                gender=product.gender,
+                is_active=product.is_active,
+                product_created_at=product.created_at,
+            ))
+    return rows
@@ -0,0 +1,132 @@
+"""
+Checkout: turn a cart into an order without overselling.
+
+Everything runs in one transaction and in a fixed number of queries,
+however large the cart: the cart is loaded once (totals are computed in the
+same pass), stock is reserved with one locked read and one conditional
+``UPDATE ... SET stock = stock - qty WHERE stock >= qty``, and the order
+lines are written with a single ``bulk_create``, each with a snapshot of
+its title, size, color, price and image. Two concurrent checkouts
+can never both take the last unit; the loser's order is rolled back.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, When
+from django.utils import timezone
+
+from .catalog import color_image_file, refresh_product_listings
+from .models import ProductVariant, CartItem, Order, OrderItem
+
+
+class EmptyCart(Exception):
+    """Raised when the cart has no items (e.g. it was just checked out by another request)"""
+
+
+class OutOfStock(Exception):
+    """Raised when one or more cart lines can no longer be fulfilled"""
+
+    def __init__(self, items):
+        super().__init__('Insufficient stock')
+        self.items = items
+
+
+def reserve_stock(items):
+    """
+    Decrement stock for every cart item in two statements, or raise OutOfStock.
+
+    Must run inside a transaction so a partial reservation is rolled back.
+    The variant rows are locked first, in primary key order, so concurrent
+    checkouts of overlapping carts queue up instead of deadlocking; a single
+    ``UPDATE ... CASE`` then takes every line's quantity at once.
+    """
+    quantities = {item.variant_id: item.quantity for item in items}
+    locked = dict(
+        ProductVariant.objects.select_for_update()
+        .filter(pk__in=quantities)
+        .order_by('pk')
+        .values_list('pk', 'stock')
+    )
+    unavailable = [item for item in items if locked.get(item.variant_id, 0) < item.quantity]
+    if unavailable:
+        raise OutOfStock(unavailable)
+
+    # Each row only matches while it still has enough stock, so the row count
+    # doubles as a guard on databases where select_for_update is a no-op.
+    enough_stock = Q()
+    for variant_id, quantity in quantities.items():
+        enough_stock |= Q(pk=variant_id, stock__gte=quantity)
+    updated = ProductVariant.objects.filter(enough_stock).update(
+        stock=Case(
+            *[When(pk=variant_id, then=F('stock') - quantity) for variant_id, quantity in quantities.items()],
+            default=F('stock'),
+            output_field=PositiveIntegerField(),
+        ),
+        updated_at=timezone.now(),
+    )
+    if updated != len(quantities):
+        raise OutOfStock(items)
+
+
+def out_of_stock_payload(items):
+    """Describe the lines that could not be reserved, with the stock left now"""
+    available = dict(
+        ProductVariant.objects.filter(pk__in=[item.variant_id for item in items]).values_list('pk', 'stock')
+    )
+    return [
+        {
+            'variant': item.variant_id,
+            'product_title': item.variant.product.title,
+            'size': item.variant.size,
+            'color': item.variant.color,
+            'requested': item.quantity,
+            'available': available.get(item.variant_id, 0),
+        }
+        for item in items
+    ]
+
+
+def place_order(cart, **order_fields):
+    """
+    Create an order from the cart, reserve its stock and empty the cart.
+
+    The order belongs to the cart's owner: its user, or for guest carts its guest key.
+
+    Raises EmptyCart or OutOfStock (nothing is written) if the cart cannot be ordered.
+    """
+    with transaction.atomic():
+        items = list(
+            CartItem.objects.filter(cart=cart)
+            .select_related('variant__primary_image', 'variant__product__primary_image')
+        )
+        if not items:
+            raise EmptyCart()
+        reserve_stock(items)
+
+        order = Order.objects.create(
+            user_id=cart.user_id,
+            guest_key=cart.guest_key,
+            total_amount=sum((item.subtotal for item in items), Decimal('0.00')),
+            **order_fields,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                variant=item.variant,
+                product_title=item.variant.product.title,
+                size=item.variant.size,
+                color=item.variant.color,
+                price=item.variant.price,
+                quantity=item.quantity,
+                product_image=getattr(color_image_file(item.variant.product, item.variant), 'name', ''),
+            )
+            for item in items
+        ])
+        CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
+        cart.bump_version()
+
+        # Stock changed through update(), which bypasses the listing signals. The
+        # order is committed by then: a failed refresh is logged, not raised.
+        product_ids = {item.variant.product_id for item in items}
+        transaction.on_commit(lambda: refresh_product_listings(product_ids), robust=True)
+    return order
@@ -0,0 +1,135 @@
+"""
+Responsive derivatives of uploaded product and banner images.
+
+Uploads are stored as-is (up to 10MB) and used to be served as-is to
+listing grids. ``build_renditions`` runs once at upload time and writes,
+next to the original, WebP and JPEG copies at a few widths plus a tiny
+blurred placeholder inlined as a data URI:
+
+    {
+        'thumb': {'width': 200, 'height': 250, 'webp': '<name>', 'jpeg': '<name>'},
+        'card': {...},
+        'full': {...},
+        'placeholder': 'data:image/webp;base64,...',
+    }
+
+The map is stored on the model (``renditions``) and serializers turn it
+into ``srcset`` strings with ``renditions_srcset``. Images that predate
+this, or failed to process, have an empty map and fall back to the
+original file. ``manage.py generate_image_renditions`` fills those in.
+"""
+import base64
+import uuid
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageFilter, ImageOps
+
+from .media import media_url
+
+
+# (name, max width) from smallest to largest; images are never upscaled
+RENDITION_WIDTHS = (
+    ('thumb', 200),
+    ('card', 600),
+    ('full', 1600),
+)
+RENDITION_FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+PLACEHOLDER_WIDTH = 16
+
+
+def _flatten(image):
+    """JPEG has no alpha channel: paint transparent pixels white"""
+    if image.mode != 'RGBA':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _resize(image, width):
+    if image.width <= width:
+        return image
+    return image.resize((width, max(round(image.height * width / image.width), 1)), Image.LANCZOS)
+
+
+def _encode(image, pil_format, options):
+    buffer = BytesIO()
+    (_flatten(image) if pil_format == 'JPEG' else image).save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _open(file):
+    """Decode ``file`` (upright, RGB or RGBA), drafting large JPEGs at reduced scale"""
+    file.seek(0)
+    with Image.open(file) as source:
+        largest = RENDITION_WIDTHS[-1][1]
+        source.draft('RGB', (largest, largest))  # JPEG only; decodes at 1/2, 1/4 or 1/8 scale
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ('RGBA', 'LA', 'PA') or 'transparency' in source.info
+        return source.convert('RGBA' if has_alpha else 'RGB')
+
+
+def build_renditions(file, upload_to, storage=None):
+    """
+    Write the derivatives of an image ``file`` (an uploaded file or an open
+    FieldFile) under ``upload_to`` and return the renditions map.
+
+    Returns {} when the file is not an image Pillow can read (videos, corrupt
+    uploads), so callers can always store the result and serve the original.
+    The file is rewound afterwards so it can still be saved.
+    """
+    storage = storage or default_storage
+    try:
+        image = _open(file)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        print(f"Could not create image renditions: {e}")
+        return {}
+    finally:
+        file.seek(0)
+
+    stem = f"{upload_to.rstrip('/')}/renditions/{uuid.uuid4().hex[:12]}"
+    renditions = {}
+    previous = None
+    for size, width in RENDITION_WIDTHS:
+        resized = _resize(image, width)
+        if previous is not None and previous['width'] == resized.width:
+            # Source narrower than this size: reuse the previous files
+            renditions[size] = previous
+            continue
+        entry = {'width': resized.width, 'height': resized.height}
+        for key, pil_format, extension, options in RENDITION_FORMATS:
+            entry[key] = storage.save(f'{stem}-{size}.{extension}', ContentFile(_encode(resized, pil_format, options)))
+        renditions[size] = previous = entry
+
+    tiny = _resize(image, PLACEHOLDER_WIDTH).filter(ImageFilter.GaussianBlur(1))
+    encoded = base64.b64encode(_encode(tiny, 'WEBP', {'quality': 40})).decode('ascii')
+    renditions['placeholder'] = f'data:image/webp;base64,{encoded}'
+    return renditions
+
+
+def rendition_name(renditions, size='card', key='jpeg'):
+    """Storage name of one derivative, or None if the image has no renditions"""
+    entry = (renditions or {}).get(size)
+    return entry.get(key) if entry else None
+
+
+def renditions_srcset(renditions, request=None):
+    """``{'webp': 'url 200w, url 600w, ...', 'jpeg': ...}`` for an <img>/<picture> srcset, or None"""
+    if not renditions or RENDITION_WIDTHS[0][0] not in renditions:
+        return None
+    srcset = {}
+    for key, _, _, _ in RENDITION_FORMATS:
+        seen = set()
+        candidates = []
+        for size, _ in RENDITION_WIDTHS:
+            entry = renditions.get(size)
+            if entry and entry['width'] not in seen:
+                seen.add(entry['width'])
+                candidates.append(f"{media_url(entry[key], request)} {entry['width']}w")
+        srcset[key] = ', '.join(candidates)
+    return srcset
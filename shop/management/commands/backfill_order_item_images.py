@@ -0,0 +1,58 @@
+"""
+Django management command to snapshot product images onto order lines
+placed before OrderItem.product_image existed.
+
+Only lines without a snapshot whose variant still exists are touched, so
+the command is safe to re-run (and cheap once everything is filled in).
+Lines whose variant was deleted keep an empty image.
+
+Usage: python manage.py backfill_order_item_images [--batch-size 500]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from shop.catalog import color_image_file
+from shop.models import OrderItem
+
+
+class Command(BaseCommand):
+    help = 'Fill in OrderItem.product_image for historical orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Order lines updated per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        pending = OrderItem.objects.filter(product_image='', variant__isnull=False).order_by('pk')
+
+        filled = missing = 0
+        last_pk = 0
+        while True:
+            batch = list(
+                pending.filter(pk__gt=last_pk)
+                .select_related('variant__primary_image', 'variant__product__primary_image')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            changed = []
+            for item in batch:
+                image = color_image_file(item.variant.product, item.variant)
+                if image:
+                    item.product_image = image.name
+                    changed.append(item)
+                else:
+                    missing += 1
+            with transaction.atomic():
+                OrderItem.objects.bulk_update(changed, ['product_image'])
+            filled += len(changed)
+            self.stdout.write(f'  {filled} order line(s) updated...')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'✅ Snapshotted images for {filled} order line(s); {missing} had no image to record.')
+        )
@@ -0,0 +1,211 @@
+"""
+Django management command to benchmark the hot-path indexes.
+Seeds a large catalog and order history, then prints EXPLAIN plans and
+latencies for the storefront, My Orders and dashboard queries with and
+without the indexes added in migration 0009.
+
+Everything (seed data and index changes) runs in one transaction that is
+rolled back at the end, so the database is left untouched.
+
+Usage: python manage.py benchmark_indexes [--products 2000] [--orders 20000] [--repeat 5]
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from shop.models import Category, Product, ProductVariant, ProductImage, Order
+
+
+BENCHMARK_INDEXES = {
+    Product: ('product_active_created_idx', 'product_active_gender_idx'),
+    ProductVariant: ('variant_product_color_idx',),
+    ProductImage: ('image_variant_primary_idx',),
+    Order: ('order_created_idx', 'order_user_created_idx', 'order_status_idx', 'order_paid_created_idx'),
+}
+
+COLORS = ('Black', 'White', 'Blue', 'Red')
+SIZES = ('S', 'M', 'L', 'XL')
+
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark transaction"""
+
+
+class Command(BaseCommand):
+    help = 'Benchmark catalog/order queries with and without the hot-path indexes (rolled back afterwards)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000, help='Products to seed (default: 2000)')
+        parser.add_argument('--orders', type=int, default=20000, help='Orders to seed (default: 20000)')
+        parser.add_argument('--users', type=int, default=500, help='Customers to seed (default: 500)')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (default: 5)')
+        parser.add_argument(
+            '--no-input',
+            action='store_true',
+            help='Skip confirmation prompt',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            # Dropping indexes inside a rolled-back transaction needs transactional DDL
+            self.stdout.write(self.style.ERROR('❌ benchmark_indexes requires PostgreSQL.'))
+            return
+
+        if not options['no_input']:
+            confirm = input(
+                '⚠️  WARNING: This drops and recreates indexes inside a transaction and locks the '
+                'affected tables while it runs. Do not run it against a busy production database.\n'
+                'Type "yes" to continue: '
+            )
+            if confirm.lower() != 'yes':
+                self.stdout.write(self.style.ERROR('Operation cancelled.'))
+                return
+
+        self.repeat = max(options['repeat'], 1)
+        try:
+            with transaction.atomic():
+                self.stdout.write('🌱 Seeding benchmark data...')
+                probes = self.seed(options['products'], options['orders'], options['users'])
+                self.analyze()
+
+                with connection.schema_editor() as editor:
+                    for model, index in self.indexes():
+                        editor.remove_index(model, index)
+                self.analyze()
+                before = self.run_queries(probes, 'WITHOUT hot-path indexes')
+
+                with connection.schema_editor() as editor:
+                    for model, index in self.indexes():
+                        editor.add_index(model, index)
+                self.analyze()
+                after = self.run_queries(probes, 'WITH hot-path indexes')
+
+                self.report(before, after)
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\nBenchmark data and index changes rolled back.'))
+
+    def indexes(self):
+        for model, names in BENCHMARK_INDEXES.items():
+            for index in model._meta.indexes:
+                if index.name in names:
+                    yield model, index
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def seed(self, product_count, order_count, user_count):
+        now = timezone.now()
+        category = Category.objects.create(name=f'Benchmark {now.timestamp()}')
+        genders = [choice for choice, _ in Product.Gender.choices]
+
+        # bulk_create skips save() and signals (no default variants, no listing rebuilds)
+        products = Product.objects.bulk_create([
+            Product(
+                category=category,
+                title=f'Benchmark Product {idx}',
+                slug=f'benchmark-{now.timestamp():.0f}-{idx}',
+                base_price=Decimal('499.00'),
+                gender=genders[idx % len(genders)],
+                is_active=idx % 10 != 0,
+            )
+            for idx in range(product_count)
+        ], batch_size=500)
+        # auto_now_add ignores explicit values on insert, so spread creation dates afterwards
+        for idx, product in enumerate(products):
+            product.created_at = now - timedelta(minutes=idx)
+        Product.objects.bulk_update(products, ['created_at'], batch_size=500)
+
+        variants = ProductVariant.objects.bulk_create([
+            ProductVariant(product=product, size=size, color=color, stock=(idx * 7) % 5)
+            for product in products
+            for idx, (color, size) in enumerate((c, s) for c in COLORS for s in SIZES)
+        ], batch_size=1000)
+        ProductImage.objects.bulk_create([
+            ProductImage(
+                product=variant.product,
+                variant=variant,
+                image=f'products/images/benchmark-{variant.pk}-{position}.jpg',
+                display_order=position,
+                is_primary=position == 0,
+            )
+            for variant in variants if variant.size == 'S'
+            for position in range(3)
+        ], batch_size=1000)
+
+        users = User.objects.bulk_create([
+            User(username=f'benchmark_{now.timestamp():.0f}_{idx}', email=f'benchmark{idx}@example.com')
+            for idx in range(user_count)
+        ], batch_size=500)
+        statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+        orders = Order.objects.bulk_create([
+            Order(
+                user=users[idx % len(users)],
+                order_number=f'B{idx:09d}',
+                status=statuses[idx % len(statuses)],
+                shipping_address='Benchmark address',
+                total_amount=Decimal('999.00'),
+                payment_verified=idx % 3 == 0,
+            )
+            for idx in range(order_count)
+        ], batch_size=1000)
+        for idx, order in enumerate(orders):
+            order.created_at = now - timedelta(hours=idx % (24 * 365))
+        Order.objects.bulk_update(orders, ['created_at'], batch_size=1000)
+
+        return {
+            'product': products[len(products) // 2],
+            'variant': variants[len(variants) // 2],
+            'user': users[len(users) // 2],
+            'since': now - timedelta(days=180),
+        }
+
+    def queries(self, probes):
+        return [
+            ('Product list (gender, newest first)', Product.objects.filter(
+                Q(gender='MEN') | Q(gender='UNISEX'), is_active=True
+            ).order_by('-created_at')[:20]),
+            ('Product list (all, newest first)', Product.objects.filter(is_active=True).order_by('-created_at')[:20]),
+            ('Variants of a color in stock', ProductVariant.objects.filter(
+                product=probes['product'], color='Blue', stock__gt=0
+            )),
+            ('Primary variant image', ProductImage.objects.filter(
+                variant=probes['variant'], is_primary=True
+            ).order_by('display_order')[:1]),
+            ('My Orders', Order.objects.filter(user=probes['user']).order_by('-created_at')[:20]),
+            ('Admin orders (newest first)', Order.objects.order_by('-created_at')[:20]),
+            ('Pending orders count', Order.objects.filter(status='PAYMENT_PENDING').values('status').annotate(
+                count=Count('id')
+            )),
+            ('Revenue since date', Order.objects.filter(
+                payment_verified=True, created_at__gte=probes['since']
+            ).values('payment_verified').annotate(total=Sum('total_amount'))),
+        ]
+
+    def run_queries(self, probes, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {label} ==='))
+        results = {}
+        for name, queryset in self.queries(probes):
+            timings = []
+            for _ in range(self.repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            results[name] = sorted(timings)[len(timings) // 2]
+            self.stdout.write(self.style.SUCCESS(f'\n{name}: median {results[name]:.2f} ms'))
+            self.stdout.write(queryset.explain())
+        return results
+
+    def report(self, before, after):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Summary (median ms) ==='))
+        self.stdout.write(f"{'Query':<40}{'Without':>12}{'With':>12}{'Speed-up':>12}")
+        for name, without_ms in before.items():
+            with_ms = after[name]
+            speedup = without_ms / with_ms if with_ms else float('inf')
+            self.stdout.write(f'{name:<40}{without_ms:>12.2f}{with_ms:>12.2f}{speedup:>11.1f}x')
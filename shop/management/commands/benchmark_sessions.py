@@ -0,0 +1,139 @@
+"""
+Django management command to measure django_session writes per request.
+Replays the same traffic (anonymous catalog browsing, a guest adding to
+cart, and a signed-in shopper) under the old session setup
+(database sessions, SESSION_SAVE_EVERY_REQUEST, and an inactive
+anonymous_* User stored in the session for every guest that touches the
+cart or orders API) and the current one (signed guest cookie,
+SlidingSessionMiddleware and SESSION_ENGINE from settings), and prints
+session reads/writes for each.
+
+Everything runs in a transaction that is rolled back afterwards.
+
+Usage: python manage.py benchmark_sessions [--requests 200]
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from shop.models import Category, Product
+
+
+LEGACY_GUEST_PATHS = ('/api/cart/', '/api/orders/')
+
+
+class LegacyGuestSessionMiddleware:
+    """
+    Replays the old get_or_create_session_user(): guests hitting the cart or
+    orders API get an inactive anonymous User whose id lives in their session.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path.startswith(LEGACY_GUEST_PATHS) and not request.user.is_authenticated:
+            if not request.session.session_key:
+                request.session.create()
+            user_id = request.session.get('anonymous_user_id')
+            if not user_id or not User.objects.filter(pk=user_id).exists():
+                username = f'anonymous_{request.session.session_key[:8]}'
+                while User.objects.filter(username=username).exists():
+                    username = f'anonymous_{uuid.uuid4().hex[:8]}'
+                user = User.objects.create_user(username=username, email=f'{username}@anonymous.local', is_active=False)
+                request.session['anonymous_user_id'] = user.id
+                request.session.save()
+        return self.get_response(request)
+
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark transaction"""
+
+
+class Command(BaseCommand):
+    help = 'Compare django_session reads/writes per request before and after the sliding session setup'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per scenario (default: 200)')
+
+    def handle(self, *args, **options):
+        requests = max(options['requests'], 1)
+        legacy_middleware = []
+        for name in settings.MIDDLEWARE:
+            if name == 'shop.middleware.SlidingSessionMiddleware':
+                continue
+            legacy_middleware.append(name)
+            if name == 'django.contrib.auth.middleware.AuthenticationMiddleware':
+                legacy_middleware.append(f'{__name__}.LegacyGuestSessionMiddleware')
+        setups = [
+            ('Before (db sessions, anonymous guest users, save every request)', {
+                'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+                'SESSION_SAVE_EVERY_REQUEST': True,
+                'MIDDLEWARE': legacy_middleware,
+            }),
+            (f'After ({settings.SESSION_ENGINE.rsplit(".", 1)[-1]}, sliding refresh)', {}),
+        ]
+
+        try:
+            with transaction.atomic():
+                category = Category.objects.create(name='Session Benchmark')
+                product = Product.objects.create(category=category, title='Session Benchmark Tee', base_price=499)
+                variant = product.variants.get()
+                shopper = User.objects.create_user(username='session_benchmark_shopper', password='benchmark')
+
+                results = []
+                for label, overrides in setups:
+                    with override_settings(ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False, **overrides):
+                        cache.clear()
+                        results.append((label, self.run_scenarios(requests, variant, shopper)))
+                self.report(requests, results)
+                raise Rollback
+        except Rollback:
+            self.stdout.write(self.style.SUCCESS('\nBenchmark data rolled back.'))
+
+    def run_scenarios(self, requests, variant, shopper):
+        browsing = Client()
+
+        def browse(idx):
+            browsing.get('/api/products/' if idx % 2 else '/api/categories/')
+
+        guest = Client()
+
+        def guest_cart(idx):
+            if idx % 10 == 0:
+                guest.post('/api/cart/add', {'variant_id': variant.pk, 'quantity': 1}, content_type='application/json')
+            else:
+                guest.get('/api/cart/' if idx % 2 else '/api/products/')
+
+        signed_in = Client()
+        signed_in.force_login(shopper)
+
+        def shopper_visit(idx):
+            signed_in.get('/api/cart/' if idx % 2 else '/api/orders/my-orders')
+
+        return [
+            ('Anonymous catalog GETs', self.measure(browse, requests)),
+            ('Guest browsing + cart', self.measure(guest_cart, requests)),
+            ('Signed-in shopper (session auth)', self.measure(shopper_visit, requests)),
+        ]
+
+    def measure(self, request, count):
+        with CaptureQueriesContext(connection) as ctx:
+            for idx in range(count):
+                request(idx)
+        session_sql = [query['sql'].lstrip().upper() for query in ctx.captured_queries if 'django_session' in query['sql']]
+        writes = sum(1 for sql in session_sql if sql.startswith(('INSERT', 'UPDATE', 'DELETE')))
+        reads = len(session_sql) - writes
+        return reads, writes
+
+    def report(self, requests, results):
+        for label, scenarios in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {label} ==='))
+            self.stdout.write(f"{'Scenario':<36}{'Reads':>8}{'Writes':>8}{'Writes/request':>16}")
+            for name, (reads, writes) in scenarios:
+                self.stdout.write(f'{name:<36}{reads:>8}{writes:>8}{writes / requests:>16.2f}')
@@ -0,0 +1,76 @@
+"""
+Django management command to create responsive renditions (resized WebP/JPEG
+copies and a blur placeholder, see shop/images.py) for product images and
+banners uploaded before renditions existed, or whose processing failed.
+
+Originals are read back from storage, so this can take a while on large
+catalogs; it only touches images without renditions unless --force is given
+and can be re-run at any time.
+
+Usage: python manage.py generate_image_renditions [--force] [--batch-size 50]
+"""
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from shop.caching import bump_catalog_version
+from shop.catalog import refresh_product_listings
+from shop.images import build_renditions
+from shop.models import ProductImage, Banner
+
+
+class Command(BaseCommand):
+    help = 'Create resized WebP/JPEG renditions for existing product images and banners'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate renditions for every image, not only those without any',
+        )
+        parser.add_argument('--batch-size', type=int, default=50, help='Images loaded per query (default: 50)')
+
+    def handle(self, *args, **options):
+        self.batch_size = max(options['batch_size'], 1)
+        self.force = options['force']
+
+        product_ids = set()
+        for image in self.pending(ProductImage, 'image'):
+            product_ids.add(image.product_id)
+        banners = sum(1 for _ in self.pending(Banner, 'media'))
+
+        # update() bypassed the signals: listing rows show the card-size renditions
+        refresh_product_listings(product_ids)
+        bump_catalog_version('banners')
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Renditions created for images of {len(product_ids)} product(s) and {banners} banner(s).'
+        ))
+
+    def pending(self, model, field_name):
+        """Generate and store renditions for ``model`` rows that need them, yielding each one updated"""
+        queryset = model.objects.exclude(**{field_name: ''}).order_by('pk')
+        if not self.force:
+            queryset = queryset.filter(renditions={})
+        upload_to = model._meta.get_field(field_name).upload_to
+
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:self.batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            for obj in batch:
+                file = getattr(obj, field_name)
+                try:
+                    file.open('rb')
+                except OSError as e:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {model.__name__} {obj.pk}: cannot read {file.name}: {e}'))
+                    continue
+                try:
+                    renditions = build_renditions(file, upload_to)
+                finally:
+                    file.close()
+                if not renditions:
+                    self.stdout.write(self.style.WARNING(f'⚠️  {model.__name__} {obj.pk}: {file.name} is not a readable image'))
+                    continue
+                model.objects.filter(pk=obj.pk).update(renditions=renditions, updated_at=timezone.now())
+                self.stdout.write(f'  {model.__name__} {obj.pk}: {file.name}')
+                yield obj
@@ -0,0 +1,84 @@
+"""
+Django management command to purge stale guest data.
+Deletes, in small batches:
+  - legacy inactive anonymous_* users (and their carts) that never placed an order
+  - guest carts with no activity for --days, and empty user carts just as old
+  - expired database-backed sessions
+
+Each batch is its own short transaction, so the command can be stopped at
+any time and simply re-run to continue where it left off.
+
+Usage: python manage.py purge_stale_data [--days 30] [--batch-size 500] [--sleep 0.5] [--dry-run]
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from shop.models import Cart, CartItem, Order, LEGACY_ANONYMOUS_USERS
+
+
+class Command(BaseCommand):
+    help = 'Purge stale anonymous users, abandoned carts and expired sessions in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Only purge data idle for this many days (default: 30)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows deleted per transaction (default: 500)')
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches (default: 0)')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows would be deleted',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = max(options['batch_size'], 1)
+        self.sleep = max(options['sleep'], 0)
+        self.dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(days=options['days'])
+
+        if self.dry_run:
+            self.stdout.write(self.style.WARNING('Dry run - nothing will be deleted.'))
+
+        # Deleting a user cascades to their orders, so anyone who ever ordered is kept
+        anonymous_users = User.objects.filter(LEGACY_ANONYMOUS_USERS, date_joined__lt=cutoff).exclude(
+            Exists(Order.objects.filter(user=OuterRef('pk')))
+        )
+        self.purge('anonymous users', anonymous_users)
+
+        stale_carts = Cart.objects.filter(updated_at__lt=cutoff).filter(
+            Q(user__isnull=True) | ~Exists(CartItem.objects.filter(cart=OuterRef('pk')))
+        )
+        self.purge('guest/empty carts', stale_carts)
+
+        if settings.SESSION_ENGINE in ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db'):
+            self.purge('expired sessions', Session.objects.filter(expire_date__lt=timezone.now()))
+        else:
+            self.stdout.write(f'Sessions are not stored in the database ({settings.SESSION_ENGINE}); skipping.')
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Stale data purge finished.'))
+
+    def purge(self, label, queryset):
+        if self.dry_run:
+            self.stdout.write(f'  {label}: {queryset.count()} would be deleted')
+            return
+
+        deleted = 0
+        while True:
+            # Re-query every time so an interrupted run resumes from whatever is left
+            batch = list(queryset.order_by('pk').values_list('pk', flat=True)[:self.batch_size])
+            if not batch:
+                break
+            with transaction.atomic():
+                # Keep the staleness filter so rows revived since the SELECT are skipped
+                _, per_model = queryset.filter(pk__in=batch).delete()
+            deleted += per_model.get(queryset.model._meta.label, 0)
+            self.stdout.write(f'  {label}: {deleted} deleted...')
+            if self.sleep:
+                time.sleep(self.sleep)
+        self.stdout.write(self.style.SUCCESS(f'✓ {label}: {deleted} deleted'))
@@ -0,0 +1,37 @@
+"""
+Django management command to rebuild the denormalized product listing table.
+Primary image pointers (Product/ProductVariant.primary_image) are recomputed
+first, since the listing rows read their thumbnails through them.
+Usage: python manage.py rebuild_product_listings [--batch-size 200]
+"""
+from django.core.management.base import BaseCommand
+from shop.catalog import refresh_primary_images, refresh_product_listings
+from shop.models import Product, ProductListing
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ProductListing read model (one row per product/color) from the catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Number of products rebuilt per transaction (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        product_ids = list(Product.objects.order_by('pk').values_list('pk', flat=True))
+
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start:start + batch_size]
+            refresh_primary_images(batch)
+            refresh_product_listings(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Rebuilt listings for {len(product_ids)} product(s): '
+                f'{ProductListing.objects.count()} row(s)'
+            )
+        )
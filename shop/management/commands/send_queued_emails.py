@@ -0,0 +1,122 @@
+"""
+Django management command to deliver emails queued in the EmailOutbox.
+Sends due emails in batches over a single SMTP connection per batch and
+retries failures with exponential backoff (1, 2, 4, ... minutes, capped),
+giving up after --max-attempts.
+
+Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so several
+workers can run side by side without sending an email twice.
+
+Usage: python manage.py send_queued_emails [--loop] [--batch-size 50] [--interval 10]
+"""
+import time
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from shop.models import EmailOutbox
+
+
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 60 * 60
+
+
+class Command(BaseCommand):
+    help = 'Send queued emails from the outbox (once, or continuously with --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails sent per SMTP connection (default: 50)')
+        parser.add_argument('--max-attempts', type=int, default=5, help='Attempts before an email is marked failed (default: 5)')
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox every --interval seconds',
+        )
+        parser.add_argument('--interval', type=float, default=10, help='Seconds between polls with --loop (default: 10)')
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        max_attempts = max(options['max_attempts'], 1)
+
+        if not options['loop']:
+            sent, failed = self.drain(batch_size, max_attempts)
+            self.stdout.write(self.style.SUCCESS(f'✅ Sent {sent} email(s), {failed} failed attempt(s).'))
+            return
+
+        self.stdout.write('📬 Email worker started.')
+        while True:
+            sent, failed = self.drain(batch_size, max_attempts)
+            if sent or failed:
+                self.stdout.write(f'Sent {sent} email(s), {failed} failed attempt(s).')
+            time.sleep(options['interval'])
+
+    def drain(self, batch_size, max_attempts):
+        """Send batches until nothing is due"""
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = self.send_batch(batch_size, max_attempts)
+            total_sent += sent
+            total_failed += failed
+            if sent + failed < batch_size:
+                return total_sent, total_failed
+
+    def send_batch(self, batch_size, max_attempts):
+        now = timezone.now()
+        with transaction.atomic():
+            due = EmailOutbox.objects.filter(status='PENDING', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            emails = list(due[:batch_size])
+            if not emails:
+                return 0, 0
+
+            sent = failed = 0
+            smtp = get_connection()
+            try:
+                smtp.open()
+            except Exception as e:
+                # Could not reach the server at all: back off every email in the batch
+                for email in emails:
+                    self.record_failure(email, e, max_attempts)
+                return 0, len(emails)
+
+            try:
+                for email in emails:
+                    message = EmailMultiAlternatives(
+                        subject=email.subject,
+                        body=email.body,
+                        from_email=email.from_email or None,
+                        to=email.recipients,
+                        connection=smtp,
+                    )
+                    if email.html_body:
+                        message.attach_alternative(email.html_body, 'text/html')
+                    try:
+                        message.send(fail_silently=False)
+                    except Exception as e:
+                        self.record_failure(email, e, max_attempts)
+                        failed += 1
+                        continue
+                    email.status = 'SENT'
+                    email.attempts += 1
+                    email.sent_at = timezone.now()
+                    email.last_error = ''
+                    email.save(update_fields=['status', 'attempts', 'sent_at', 'last_error', 'updated_at'])
+                    sent += 1
+            finally:
+                smtp.close()
+        return sent, failed
+
+    def record_failure(self, email, error, max_attempts):
+        email.attempts += 1
+        email.last_error = str(error)
+        if email.attempts >= max_attempts:
+            email.status = 'FAILED'
+            self.stdout.write(self.style.ERROR(f'❌ Giving up on email {email.pk} to {email.recipients}: {error}'))
+        else:
+            delay = min(RETRY_BASE_SECONDS * 2 ** (email.attempts - 1), RETRY_MAX_SECONDS)
+            email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+            self.stdout.write(self.style.WARNING(f'⚠️  Email {email.pk} failed (attempt {email.attempts}), retrying in {delay}s: {error}'))
+        email.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at', 'updated_at'])
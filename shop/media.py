@@ -0,0 +1,57 @@
+"""
+Absolute URLs for uploaded media.
+
+``FieldFile.url`` asks the storage backend to build the URL on every call;
+with Cloudinary that is a signed URL assembled in Python, and a product list
+repeats it for every image on the page. ``media_url`` instead:
+
+* caches storage name -> URL in a bounded LRU (MEDIA_URL_CACHE_SIZE entries,
+  shared by every request in the process), and
+* works out the request's scheme/host prefix once per request and prepends
+  it to relative URLs, instead of ``build_absolute_uri`` for each one.
+
+Storage URLs only depend on the file name and the storage configuration,
+so cached entries never go stale; new uploads get new names.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+
+@lru_cache(maxsize=getattr(settings, 'MEDIA_URL_CACHE_SIZE', 4096))
+def storage_url(storage, name):
+    return storage.url(name)
+
+
+def request_url_prefix(request):
+    """``scheme://host`` of the request, computed once and kept on the request"""
+    prefix = getattr(request, '_media_url_prefix', None)
+    if prefix is None:
+        prefix = f'{request.scheme}://{request.get_host()}'
+        request._media_url_prefix = prefix
+    return prefix
+
+
+def media_url(file, request=None, storage=None):
+    """
+    URL of a stored file: a FieldFile, or a storage name (``storage`` defaults
+    to the default file storage). Absolute when a request is given; None when
+    there is no file.
+    """
+    if not file:
+        return None
+    if isinstance(file, str):
+        name = file
+        storage = storage or default_storage
+    else:
+        name = file.name
+        storage = file.storage
+    url = storage_url(storage, name)
+    if request is None:
+        return url
+    if url.startswith('/') and not url.startswith('//'):
+        return request_url_prefix(request) + url
+    if '://' in url or url.startswith('//'):
+        return url
+    return request.build_absolute_uri(url)
@@ -1,3 +1,7 @@
+import time
+import uuid
+
+from django.conf import settings
 from django.shortcuts import redirect
 from django.urls import reverse
 from django.contrib.auth import logout
@@ -42,3 +46,105 @@ class LoginFirstMiddleware:
         
         return self.get_response(request)
 
+
+
+GUEST_COOKIE_SALT = 'shop.guest_cart'
+
+
+def _http_request(request):
+    # DRF's Request proxies reads to the HttpRequest but keeps attribute writes to itself
+    return getattr(request, '_request', request)
+
+
+def get_guest_key(request, create=False):
+    """
+    Key of the guest cart/orders for this visitor, read from the signed guest cookie.
+
+    With ``create=True`` a new key is issued (and set on the response by
+    GuestCartMiddleware); otherwise None is returned for unknown visitors.
+    """
+    http_request = _http_request(request)
+    key = getattr(http_request, 'guest_key', None)
+    if key is None and create:
+        key = uuid.uuid4().hex
+        http_request.guest_key = key
+    if key is not None:
+        # Re-sign on use so the cookie expires GUEST_CART_AGE after the last cart activity
+        http_request.guest_key_used = True
+    return key
+
+
+def forget_guest_key(request):
+    """Drop the guest cookie (e.g. after its cart was merged into a user's cart on login)"""
+    http_request = _http_request(request)
+    http_request.guest_key = None
+    http_request.guest_key_used = False
+    http_request.guest_key_forgotten = True
+
+
+class GuestCartMiddleware:
+    """
+    Identify guest shoppers by a signed cookie instead of creating a User row per visitor.
+
+    The cookie carries an opaque random key; the signature's timestamp makes
+    it expire GUEST_CART_AGE seconds after the last time a view used it.
+    Requests that never touch the cart do no extra work.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.cookie_name = getattr(settings, 'GUEST_CART_COOKIE_NAME', 'guest_cart')
+        self.max_age = getattr(settings, 'GUEST_CART_AGE', 60 * 60 * 24 * 30)
+
+    def __call__(self, request):
+        request.guest_key = request.get_signed_cookie(
+            self.cookie_name, default=None, salt=GUEST_COOKIE_SALT, max_age=self.max_age
+        )
+        request.guest_key_used = False
+        request.guest_key_forgotten = False
+
+        response = self.get_response(request)
+
+        if request.guest_key_used and request.guest_key:
+            response.set_signed_cookie(
+                self.cookie_name,
+                request.guest_key,
+                salt=GUEST_COOKIE_SALT,
+                max_age=self.max_age,
+                secure=settings.SESSION_COOKIE_SECURE,
+                httponly=True,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        elif request.guest_key_forgotten:
+            response.delete_cookie(self.cookie_name, samesite=settings.SESSION_COOKIE_SAMESITE)
+        return response
+
+
+SESSION_REFRESHED_KEY = '_refreshed_at'
+
+
+class SlidingSessionMiddleware:
+    """
+    Keep sessions alive without writing them on every request.
+
+    Replaces SESSION_SAVE_EVERY_REQUEST: a session that a view actually used
+    is re-saved (pushing its expiry forward) only once SESSION_REFRESH_FRACTION
+    of SESSION_COOKIE_AGE has passed since the last save. Requests that never
+    touch the session, like anonymous catalog GETs, cause no session I/O.
+    Must come after SessionMiddleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.refresh_after = settings.SESSION_COOKIE_AGE * getattr(settings, 'SESSION_REFRESH_FRACTION', 0.25)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        session = getattr(request, 'session', None)
+        if session is None or not session.accessed or session.modified or session.is_empty():
+            return response
+        now = int(time.time())
+        if now - session.get(SESSION_REFRESHED_KEY, 0) >= self.refresh_after:
+            session[SESSION_REFRESHED_KEY] = now  # Marks the session modified, so it is saved
+        return response
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.10 on 2026-10-17 01:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0007_add_email_to_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('color', models.CharField(blank=True, max_length=50, null=True)),
+                ('title', models.CharField(max_length=260)),
+                ('base_title', models.CharField(max_length=200)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('image', models.CharField(blank=True, max_length=255)),
+                ('has_stock', models.BooleanField(default=False)),
+                ('category_name', models.CharField(max_length=120)),
+                ('category_slug', models.SlugField(max_length=150)),
+                ('slug', models.SlugField(max_length=220)),
+                ('gender', models.CharField(choices=[('MEN', 'Men'), ('WOMEN', 'Women'), ('UNISEX', 'Unisex')], max_length=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('product_created_at', models.DateTimeField()),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='shop.category')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='listings', to='shop.product')),
+            ],
+            options={
+                'ordering': ['-product_created_at', 'product_id', 'position'],
+                'indexes': [models.Index(condition=models.Q(('is_active', True)), fields=['gender', '-product_created_at', 'product', 'position'], name='listing_active_gender_idx'), models.Index(condition=models.Q(('is_active', True)), fields=['-product_created_at', 'product', 'position'], name='listing_active_idx')],
+                'unique_together': {('product', 'position')},
+            },
+        ),
+    ]
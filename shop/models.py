@@ -1,5 +1,8 @@
 from django.db import models
+from django.db.models import ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 import uuid
 from decimal import Decimal
@@ -46,9 +49,20 @@ class Product(TimeStampedModel):
     hero_media = models.FileField(upload_to='products/', blank=True, null=True)
     is_featured = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
+    # Image that represents the product (kept current by catalog.refresh_primary_images)
+    primary_image = models.ForeignKey(
+        'ProductImage', related_name='+', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Storefront listing: active products, optionally by gender, newest first
+            models.Index(fields=['-created_at'], condition=models.Q(is_active=True), name='product_active_created_idx'),
+            models.Index(
+                fields=['gender', '-created_at'], condition=models.Q(is_active=True), name='product_active_gender_idx'
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -88,9 +102,16 @@ class ProductVariant(TimeStampedModel):
     color = models.CharField(max_length=50)
     stock = models.PositiveIntegerField(default=0)
     price_override = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
+    # Image that represents this color (kept current by catalog.refresh_primary_images)
+    primary_image = models.ForeignKey(
+        'ProductImage', related_name='+', on_delete=models.SET_NULL, null=True, blank=True, editable=False
+    )
 
     class Meta:
         unique_together = ('product', 'size', 'color')
+        indexes = [
+            models.Index(fields=['product', 'color', 'stock'], name='variant_product_color_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.title} - {self.size}/{self.color}"
@@ -106,19 +127,65 @@ class ProductImage(TimeStampedModel):
     image = models.FileField(upload_to='products/images/')
     display_order = models.PositiveIntegerField(default=0)
     is_primary = models.BooleanField(default=False)
+    # Resized WebP/JPEG derivatives and blur placeholder (see shop/images.py)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     class Meta:
         ordering = ['display_order', 'created_at']
+        indexes = [
+            models.Index(fields=['variant', 'is_primary', 'display_order'], name='image_variant_primary_idx'),
+        ]
 
     def __str__(self):
         variant_info = f" ({self.variant.color})" if self.variant else ""
         return f"{self.product.title}{variant_info} - Image {self.display_order}"
 
 
+class ProductListing(models.Model):
+    """Denormalized read model for the color-expanded product grid - one row per product/color.
+    Maintained by signals (see shop/catalog.py); never edit by hand."""
+    product = models.ForeignKey(Product, related_name='listings', on_delete=models.CASCADE)
+    position = models.PositiveIntegerField(default=0)  # Color order within the product
+    color = models.CharField(max_length=50, blank=True, null=True)
+    title = models.CharField(max_length=260)
+    base_title = models.CharField(max_length=200)
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    image = models.CharField(max_length=255, blank=True)  # Storage name of the thumbnail
+    has_stock = models.BooleanField(default=False)
+    category = models.ForeignKey(Category, related_name='+', on_delete=models.CASCADE)
+    category_name = models.CharField(max_length=120)
+    category_slug = models.SlugField(max_length=150)
+    slug = models.SlugField(max_length=220)
+    gender = models.CharField(max_length=10, choices=Product.Gender.choices)
+    is_active = models.BooleanField(default=True)
+    product_created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-product_created_at', 'product_id', 'position']
+        unique_together = ('product', 'position')
+        indexes = [
+            models.Index(
+                fields=['gender', '-product_created_at', 'product', 'position'],
+                condition=models.Q(is_active=True),
+                name='listing_active_gender_idx',
+            ),
+            models.Index(
+                fields=['-product_created_at', 'product', 'position'],
+                condition=models.Q(is_active=True),
+                name='listing_active_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
 class Banner(TimeStampedModel):
     title = models.CharField(max_length=150)
     subtitle = models.CharField(max_length=255, blank=True)
     media = models.FileField(upload_to='banners/')
+    # Resized WebP/JPEG derivatives and blur placeholder (see shop/images.py)
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     cta_text = models.CharField(max_length=50, blank=True)
     cta_link = models.CharField(max_length=255, blank=True)
     is_active = models.BooleanField(default=True)
@@ -131,23 +198,85 @@ class Banner(TimeStampedModel):
         return self.title
 
 
+def cart_line_total(prefix=''):
+    """quantity x unit price of a cart line, matching ProductVariant.price (a zero override falls back too)"""
+    unit_price = Coalesce(
+        NullIf(F(f'{prefix}variant__price_override'), Value(0)),
+        F(f'{prefix}variant__product__base_price'),
+    )
+    return ExpressionWrapper(
+        F(f'{prefix}quantity') * unit_price,
+        output_field=models.DecimalField(max_digits=12, decimal_places=2),
+    )
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate item count and amount so listing carts costs one query, not two per cart"""
+        return self.annotate(
+            items_quantity=Coalesce(Sum('items__quantity'), 0),
+            items_amount=Coalesce(
+                Sum(cart_line_total('items__')), Value(Decimal('0.00')), output_field=models.DecimalField()
+            ),
+        )
+
+
+# Inactive users created per visitor before guest carts existed (see GuestCartMiddleware)
+LEGACY_ANONYMOUS_USERS = models.Q(username__startswith='anonymous_', is_active=False)
+
+
 class Cart(TimeStampedModel):
-    user = models.OneToOneField(settings.AUTH_USER_MODEL, related_name='cart', on_delete=models.CASCADE)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, related_name='cart', on_delete=models.CASCADE, null=True, blank=True
+    )
+    # Guest carts have no user; they are found through the signed guest cookie (see shop/middleware.py)
+    guest_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    version = models.PositiveIntegerField(default=0)  # Bumped on every change to the items
+
+    objects = CartQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(user__isnull=False) | models.Q(guest_key__isnull=False), name='cart_has_owner'
+            ),
+        ]
 
     def __str__(self):
-        return f"Cart {self.pk} - {self.user}"
+        return f"Cart {self.pk} - {self.user or 'guest'}"
+
+    def bump_version(self):
+        """Record a change to the items so clients patching local state can detect missed updates"""
+        Cart.objects.filter(pk=self.pk).update(version=F('version') + 1, updated_at=timezone.now())
+        self.refresh_from_db(fields=['version', 'updated_at'])
+
+    def _prefetched_items(self):
+        return getattr(self, '_prefetched_objects_cache', {}).get('items')
+
+    def totals(self):
+        """Item count and amount in a single aggregate query"""
+        return self.items.aggregate(
+            total_items=Coalesce(Sum('quantity'), 0),
+            total_amount=Coalesce(Sum(cart_line_total()), Value(Decimal('0.00')), output_field=models.DecimalField()),
+        )
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        if hasattr(self, 'items_quantity'):
+            return self.items_quantity
+        items = self._prefetched_items()
+        if items is not None:
+            return sum(item.quantity for item in items)
+        return self.totals()['total_items']
 
     @property
     def total_amount(self):
-        total = sum(
-            (Decimal(str(item.subtotal)) for item in self.items.select_related('variant', 'variant__product')),
-            Decimal('0.00'),
-        )
-        return total
+        if hasattr(self, 'items_amount'):
+            return self.items_amount
+        items = self._prefetched_items()
+        if items is not None:
+            return sum((item.subtotal for item in items), Decimal('0.00'))
+        return self.totals()['total_amount']
 
 
 class CartItem(TimeStampedModel):
@@ -177,7 +306,10 @@ class Order(TimeStampedModel):
         ('CANCELLED', 'Cancelled'),
     ]
 
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, related_name='orders', on_delete=models.CASCADE, null=True, blank=True
+    )
+    guest_key = models.CharField(max_length=64, null=True, blank=True)  # Owner of a guest checkout
     order_number = models.CharField(max_length=20, unique=True, editable=False, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PLACED')
     shipping_address = models.TextField()  # Kept for backward compatibility
@@ -194,16 +326,35 @@ class Order(TimeStampedModel):
     upi_reference = models.CharField(max_length=100, blank=True)
     payment_verified = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='order_created_idx'),  # Admin orders list
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),  # My Orders
+            models.Index(
+                fields=['guest_key', '-created_at'],
+                condition=models.Q(guest_key__isnull=False),
+                name='order_guest_created_idx',
+            ),  # My Orders for guests
+            models.Index(fields=['status'], name='order_status_idx'),  # Dashboard status counts
+            models.Index(fields=['payment_verified', 'created_at'], name='order_paid_created_idx'),  # Revenue
+        ]
+
     def save(self, *args, **kwargs):
         if not self.order_number:
             self.order_number = str(uuid.uuid4()).split('-')[0].upper()
         # Auto-set status based on payment verification
-        if not self.payment_verified and self.status == 'PLACED':
-            self.status = 'PAYMENT_PENDING'
-        elif self.payment_verified and self.status == 'PAYMENT_PENDING':
-            self.status = 'PAYMENT_VERIFIED'
+        self.status = self.status_for_payment(self.status, self.payment_verified)
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def status_for_payment(status, payment_verified):
+        """Status stored when an order with this payment state is set to ``status`` (also used by shop/orders.py)"""
+        if not payment_verified and status == 'PLACED':
+            return 'PAYMENT_PENDING'
+        if payment_verified and status == 'PAYMENT_PENDING':
+            return 'PAYMENT_VERIFIED'
+        return status
+
     def __str__(self):
         return f"Order {self.order_number}"
 
@@ -216,10 +367,16 @@ class OrderItem(TimeStampedModel):
     color = models.CharField(max_length=50)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveIntegerField(default=1)
+    # Storage name of the line's image when it was ordered, so history survives catalog edits
+    product_image = models.CharField(max_length=255, blank=True, default='')
 
     def __str__(self):
         return f"{self.product_title} ({self.order.order_number})"
 
+    @property
+    def subtotal(self):
+        return self.price * self.quantity
+
 
 class PaymentProof(TimeStampedModel):
     order = models.OneToOneField(Order, related_name='payment_proof', on_delete=models.CASCADE)
@@ -232,6 +389,48 @@ class PaymentProof(TimeStampedModel):
         return f"PaymentProof #{self.order.order_number}"
 
 
+class CatalogVersion(models.Model):
+    """Change counter of one group of catalog endpoints, read by the response cache (see shop/caching.py)"""
+    scope = models.CharField(max_length=20, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f'{self.scope} v{self.version}'
+
+
+class EmailOutbox(TimeStampedModel):
+    """Emails queued by request handlers and delivered by ``manage.py send_queued_emails``"""
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255, blank=True)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        verbose_name = 'Queued email'
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at', 'id'], condition=models.Q(status='PENDING'), name='outbox_pending_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+
 class SiteSettings(models.Model):
     """Singleton model for site-wide settings"""
     website_name = models.CharField(max_length=200, default='EdithCloths')
@@ -0,0 +1,204 @@
+"""
+Order administration: apply one action to many orders at once.
+
+Each action runs in one transaction and a fixed number of queries, however
+many orders are selected: one locked read, one ``UPDATE`` for the orders,
+one for their payment proofs and one ``INSERT`` for any queued emails.
+``QuerySet.update()`` skips ``save()``, so ``updated_at`` is set explicitly
+and the status rules of ``Order.save()`` are applied in the ``UPDATE``.
+
+Also home to the cached admin dashboard figures, which every order change
+invalidates (see shop/signals.py).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Order, PaymentProof
+from .utils import queue_order_emails
+
+
+ORDER_ACTIONS = ('mark_paid', 'status', 'cancel')
+
+DASHBOARD_CACHE_KEY = 'orders:dashboard'
+PENDING_STATUSES = ('PLACED', 'PAYMENT_PENDING', 'PAYMENT_VERIFIED')
+
+
+def _status_update(status, changes):
+    """
+    The ``status`` value for the UPDATE, applying the same payment rules as
+    Order.save(): it depends on each row's payment_verified unless the
+    UPDATE sets that too (CASE sees the old column values).
+    """
+    if 'payment_verified' in changes:
+        return Order.status_for_payment(status, changes['payment_verified'])
+    paid, unpaid = Order.status_for_payment(status, True), Order.status_for_payment(status, False)
+    if paid == unpaid:
+        return status
+    return Case(When(payment_verified=True, then=Value(paid)), default=Value(unpaid))
+
+
+def _apply(order_ids, changes, needs_update):
+    """
+    Lock the orders, UPDATE those ``needs_update(status, payment_verified)``
+    selects with ``changes`` and return ``(results, updated_ids)``.
+
+    A requested status is adjusted per order the way Order.save() would
+    (PLACED stays PAYMENT_PENDING until paid, PAYMENT_PENDING becomes
+    PAYMENT_VERIFIED once paid); orders that would end up as they are count
+    as unchanged. ``results`` has one entry per requested id, in request
+    order, with ``result`` set to ``updated``, ``unchanged`` or ``not_found``.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    current = {
+        pk: (order_number, status, payment_verified)
+        for pk, order_number, status, payment_verified in (
+            Order.objects.select_for_update()
+            .filter(pk__in=order_ids)
+            .order_by('pk')
+            .values_list('pk', 'order_number', 'status', 'payment_verified')
+        )
+    }
+    final = {}
+    for pk, (_, status, paid) in current.items():
+        if not needs_update(status, paid):
+            continue
+        new_paid = changes.get('payment_verified', paid)
+        new_status = Order.status_for_payment(changes.get('status', status), new_paid)
+        if (new_status, new_paid) != (status, paid):
+            final[pk] = new_status
+    updated_ids = list(final)
+    if updated_ids:
+        if 'status' in changes:
+            changes = {**changes, 'status': _status_update(changes['status'], changes)}
+        Order.objects.filter(pk__in=updated_ids).update(updated_at=timezone.now(), **changes)
+        # update() sends no post_save, so drop the dashboard figures here
+        transaction.on_commit(invalidate_dashboard_stats)
+
+    results = []
+    for pk in order_ids:
+        if pk not in current:
+            results.append({'id': pk, 'result': 'not_found'})
+            continue
+        order_number, status, _ = current[pk]
+        results.append({
+            'id': pk,
+            'order_number': order_number,
+            'status': final.get(pk, status),
+            'result': 'updated' if pk in final else 'unchanged',
+        })
+    return results, updated_ids
+
+
+def mark_orders_paid(order_ids, status='PLACED'):
+    """
+    Verify payment for the orders that are not verified yet, mark their
+    payment proofs verified and queue a confirmation email for each.
+    Orders already verified keep their current status.
+    """
+    with transaction.atomic():
+        results, updated_ids = _apply(
+            order_ids,
+            {'payment_verified': True, 'status': status},
+            lambda current_status, paid: not paid,
+        )
+        if updated_ids:
+            PaymentProof.objects.filter(order_id__in=updated_ids, verified=False).update(
+                verified=True, updated_at=timezone.now()
+            )
+            # Queued with the same commit and sent by the send_queued_emails worker;
+            # an email problem must not undo the payment verification
+            try:
+                queue_order_emails('user_confirmation', updated_ids)
+            except Exception as e:
+                print(f"Error queueing confirmation emails: {str(e)}")
+    return results
+
+
+def set_orders_status(order_ids, status):
+    """Move the orders to ``status`` (one of Order.STATUS_CHOICES)"""
+    if status not in dict(Order.STATUS_CHOICES):
+        raise ValueError(f'Invalid status: {status}')
+    with transaction.atomic():
+        results, _ = _apply(order_ids, {'status': status}, lambda current_status, paid: current_status != status)
+    return results
+
+
+def cancel_orders(order_ids):
+    """Cancel the orders; delivered orders are left unchanged"""
+    with transaction.atomic():
+        results, _ = _apply(
+            order_ids,
+            {'status': 'CANCELLED'},
+            lambda current_status, paid: current_status not in ('CANCELLED', 'DELIVERED'),
+        )
+    return results
+
+
+def invalidate_dashboard_stats():
+    cache.delete(DASHBOARD_CACHE_KEY)
+
+
+def _last_months(count):
+    """First day (local time) of the current month and the ``count - 1`` months before it, oldest first"""
+    today = timezone.localtime()
+    months = []
+    for offset in range(count - 1, -1, -1):
+        year, month = divmod(today.year * 12 + today.month - 1 - offset, 12)
+        months.append(today.replace(year=year, month=month + 1, day=1, hour=0, minute=0, second=0, microsecond=0))
+    return months
+
+
+def dashboard_stats():
+    """
+    Figures for the admin dashboard.
+
+    Every order count and the revenue come from one conditional aggregate,
+    and the last six months of revenue from one ``TruncMonth`` GROUP BY.
+    The result is cached for DASHBOARD_CACHE_TIMEOUT seconds and dropped
+    whenever an order is saved, deleted or bulk-updated.
+    """
+    stats = cache.get(DASHBOARD_CACHE_KEY)
+    if stats is not None:
+        return stats
+
+    counts = Order.objects.aggregate(
+        total_orders=Count('id'),
+        total_revenue=Sum('total_amount', filter=Q(payment_verified=True)),
+        **{status: Count('id', filter=Q(status=status)) for status, _ in Order.STATUS_CHOICES},
+    )
+
+    months = _last_months(6)
+    revenue_by_month = dict(
+        Order.objects.filter(payment_verified=True, created_at__gte=months[0])
+        .annotate(month=TruncMonth('created_at'))
+        .values('month')
+        .annotate(revenue=Sum('total_amount'))
+        .values_list('month', 'revenue')
+    )
+
+    stats = {
+        'total_orders': counts['total_orders'],
+        'completed_orders': counts['DELIVERED'],
+        'pending_orders': sum(counts[status] for status in PENDING_STATUSES),
+        'cancelled_orders': counts['CANCELLED'],
+        'total_users': User.objects.count(),
+        'total_revenue': float(counts['total_revenue'] or 0),
+        'recent_orders': list(Order.objects.select_related('user').order_by('-created_at')[:10]),
+        'status_breakdown': [
+            {'status': status, 'count': counts[status]}
+            for status, _ in Order.STATUS_CHOICES
+            if counts[status]
+        ],
+        'monthly_revenue': [
+            {'month': month.strftime('%b %Y'), 'revenue': float(revenue_by_month.get(month, 0))}
+            for month in months
+        ],
+    }
+    cache.set(DASHBOARD_CACHE_KEY, stats, timeout=getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', 60))
+    return stats
+
@@ -0,0 +1,49 @@
+"""
+Cursor pagination for the large listings.
+
+DRF's CursorPagination encodes the value of the first ordering field plus an
+offset among rows that share it; the remaining fields only make the order
+deterministic. Pages stay stable while rows are added, but rows tied on the
+first field are still walked by offset.
+
+Pagination is opt-in: clients that send ``cursor`` or ``page_size`` get a
+``{"next", "previous", "results"}`` page, everybody else keeps receiving the
+plain list the frontend was built against.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Newest first: the cursor holds created_at, ties are ordered by id and skipped by offset"""
+    ordering = ('-created_at', '-id')
+    page_size = getattr(settings, 'API_PAGE_SIZE', 20)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 100)
+
+
+class DateJoinedCursorPagination(CreatedAtCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class ProductListingCursorPagination(CreatedAtCursorPagination):
+    """Color-expanded rows, newest product first; the cursor holds product_created_at, so a product's colors are walked by offset"""
+    ordering = ('-product_created_at', 'product_id', 'position')
+
+
+def is_paginated_request(request):
+    return 'cursor' in request.query_params or 'page_size' in request.query_params
+
+
+def paginated_response(view, request, queryset, serialize, pagination_class=CreatedAtCursorPagination):
+    """
+    Return a cursor-paginated Response when the client asks for one, otherwise the full list.
+
+    ``serialize`` receives the queryset (or the page of objects) and returns the response data.
+    """
+    if not is_paginated_request(request):
+        return Response(serialize(queryset))
+    paginator = pagination_class()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    return paginator.get_paginated_response(serialize(page))
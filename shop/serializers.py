@@ -1,5 +1,10 @@
 from django.contrib.auth.models import User
+from django.db import models
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from .images import rendition_name, renditions_srcset
+from .media import media_url
+from .orders import ORDER_ACTIONS
 from .models import (
     Category,
     Product,
@@ -15,6 +20,53 @@ from .models import (
 )
 
 
+def _is_prefetched(obj, name):
+    """True when ``name`` was loaded with prefetch_related() on ``obj``"""
+    return name in getattr(obj, '_prefetched_objects_cache', {})
+
+
+def _product_level_images(product):
+    """Product images not linked to a variant, read from the prefetch cache when possible"""
+    if _is_prefetched(product, 'images'):
+        return [image for image in product.images.all() if image.variant_id is None]
+    return list(product.images.filter(variant__isnull=True))
+
+
+class MediaFileField(serializers.FileField):
+    """FileField whose URL comes from the shared media URL cache"""
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        if not getattr(self, 'use_url', api_settings.UPLOADED_FILES_USE_URL):
+            return value.name
+        return media_url(value, self.context.get('request'))
+
+
+class MediaImageField(MediaFileField, serializers.ImageField):
+    pass
+
+
+class MediaFieldsMixin:
+    """Render model file/image fields through media_url instead of FieldFile.url"""
+    serializer_field_mapping = {
+        **serializers.ModelSerializer.serializer_field_mapping,
+        models.FileField: MediaFileField,
+        models.ImageField: MediaImageField,
+    }
+
+
+class DynamicFieldsMixin:
+    """Keep only the fields named in the ``fields`` kwarg (sparse fieldsets)"""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -58,28 +110,30 @@ class RegisterSerializer(serializers.ModelSerializer):
         )
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class CategorySerializer(MediaFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Category
         fields = '__all__'
 
 
-class ProductImageSerializer(serializers.ModelSerializer):
+class ProductImageSerializer(MediaFieldsMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
     
     class Meta:
         model = ProductImage
-        fields = ('id', 'image', 'image_url', 'variant', 'display_order', 'is_primary')
+        fields = ('id', 'image', 'image_url', 'srcset', 'placeholder', 'variant', 'display_order', 'is_primary')
         read_only_fields = ('image_url',)
     
     def get_image_url(self, obj):
-        if obj.image and hasattr(obj.image, 'url'):
-            request = self.context.get('request')
-            url = obj.image.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
-        return None
+        return media_url(obj.image, self.context.get('request'))
+
+    def get_srcset(self, obj):
+        return renditions_srcset(obj.renditions, self.context.get('request'))
+
+    def get_placeholder(self, obj):
+        return obj.renditions.get('placeholder')
 
 
 class ProductVariantSerializer(serializers.ModelSerializer):
@@ -97,22 +151,16 @@ class ProductVariantSerializer(serializers.ModelSerializer):
         return float(obj.price)
 
     def get_product_media(self, obj):
-        request = self.context.get('request')
-        if obj.product.hero_media and hasattr(obj.product.hero_media, 'url'):
-            url = obj.product.hero_media.url
-            if request is not None:
-                return request.build_absolute_uri(url)
-            return url
-        return None
+        return media_url(obj.product.hero_media, self.context.get('request'))
     
     def get_images(self, obj):
-        # Get images for this specific variant (color)
-        variant_images = obj.images.all()
-        if variant_images.exists():
+        # Get images for this specific variant (color) - served from the prefetch cache if present
+        variant_images = list(obj.images.all())
+        if variant_images:
             return ProductImageSerializer(variant_images, many=True, context=self.context).data
         # Fallback to product images if no variant-specific images
-        product_images = obj.product.images.filter(variant__isnull=True)
-        if product_images.exists():
+        product_images = _product_level_images(obj.product)
+        if product_images:
             return ProductImageSerializer(product_images, many=True, context=self.context).data
         return []
 
@@ -130,7 +178,7 @@ class ProductColorVariantSerializer(serializers.Serializer):
     has_stock = serializers.BooleanField()
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         queryset=Category.objects.all(), source='category', write_only=True, required=False, allow_null=True
@@ -138,7 +186,7 @@ class ProductSerializer(serializers.ModelSerializer):
     variants = ProductVariantSerializer(many=True, read_only=True)
     images = ProductImageSerializer(many=True, read_only=True)
     base_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, default=0)
-    hero_media = serializers.FileField(required=False, allow_null=True)
+    hero_media = MediaFileField(required=False, allow_null=True)
     # Add name field mapped from title for frontend compatibility
     name = serializers.CharField(source='title', read_only=True)
     # Add hero_media_url for frontend to use
@@ -168,30 +216,65 @@ class ProductSerializer(serializers.ModelSerializer):
 
     def get_hero_media_url(self, obj):
         """Return absolute URL for hero_media"""
-        if obj.hero_media and hasattr(obj.hero_media, 'url'):
-            request = self.context.get('request')
-            url = obj.hero_media.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
-        return None
+        return media_url(obj.hero_media, self.context.get('request'))
+
+
+class ProductCardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Compact product representation for listing grids (``?view=card``)"""
+    name = serializers.CharField(source='title', read_only=True)
+    price = serializers.SerializerMethodField()
+    thumbnail_url = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
+    has_stock = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Product
+        fields = ('id', 'name', 'title', 'slug', 'price', 'gender', 'thumbnail_url', 'srcset', 'placeholder', 'has_stock')
+
+    def get_price(self, obj):
+        return float(obj.base_price)
+
+    def get_thumbnail_url(self, obj):
+        """
+        Hero media, otherwise the card-size copy of the image annotated by
+        catalog.card_queryset() (the original if it has no renditions yet)
+        """
+        request = self.context.get('request')
+        if obj.hero_media:
+            return media_url(obj.hero_media, request)
+        name = rendition_name(obj.thumbnail_renditions) or obj.thumbnail
+        return media_url(name, request, storage=ProductImage._meta.get_field('image').storage)
+
+    def get_srcset(self, obj):
+        if obj.hero_media:
+            return None
+        return renditions_srcset(obj.thumbnail_renditions, self.context.get('request'))
 
+    def get_placeholder(self, obj):
+        if obj.hero_media or not obj.thumbnail_renditions:
+            return None
+        return obj.thumbnail_renditions.get('placeholder')
 
-class BannerSerializer(serializers.ModelSerializer):
+
+class BannerSerializer(MediaFieldsMixin, serializers.ModelSerializer):
     media_url = serializers.SerializerMethodField(read_only=True)
+    srcset = serializers.SerializerMethodField()
+    placeholder = serializers.SerializerMethodField()
     
     class Meta:
         model = Banner
-        fields = '__all__'
+        exclude = ('renditions',)  # Exposed as srcset/placeholder
         read_only_fields = ('created_at', 'media_url')
     
     def get_media_url(self, obj):
-        if obj.media and hasattr(obj.media, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.media.url)
-            return obj.media.url
-        return None
+        return media_url(obj.media, self.context.get('request'))
+
+    def get_srcset(self, obj):
+        return renditions_srcset(obj.renditions, self.context.get('request'))
+
+    def get_placeholder(self, obj):
+        return obj.renditions.get('placeholder')
 
 
 class CartItemSerializer(serializers.ModelSerializer):
@@ -209,6 +292,19 @@ class CartItemSerializer(serializers.ModelSerializer):
         return float(obj.subtotal)
 
 
+class CartItemDeltaSerializer(serializers.ModelSerializer):
+    """Compact cart line for ?view=delta mutation responses (no nested variant or images)"""
+    variant_id = serializers.IntegerField(read_only=True)
+    subtotal = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CartItem
+        fields = ('id', 'variant_id', 'quantity', 'subtotal')
+
+    def get_subtotal(self, obj):
+        return float(obj.subtotal)
+
+
 class CartSerializer(serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_items = serializers.IntegerField(read_only=True)
@@ -216,7 +312,7 @@ class CartSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Cart
-        fields = ('id', 'items', 'total_items', 'total_amount')
+        fields = ('id', 'version', 'items', 'total_items', 'total_amount')
 
     def get_total_amount(self, obj):
         return float(obj.total_amount)
@@ -242,42 +338,13 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return float(obj.price)
 
     def get_product_image_url(self, obj):
-        """Get product image from variant or product"""
-        request = self.context.get('request')
-        
-        # Try to get image from variant if it exists
-        if obj.variant:
-            # Try variant-specific images first
-            variant_images = obj.variant.images.all()
-            if variant_images.exists():
-                first_image = variant_images.first()
-                if first_image.image and hasattr(first_image.image, 'url'):
-                    url = first_image.image.url
-                    if request:
-                        return request.build_absolute_uri(url)
-                    return url
-            
-            # Try product hero image
-            if obj.variant.product.hero_media and hasattr(obj.variant.product.hero_media, 'url'):
-                url = obj.variant.product.hero_media.url
-                if request:
-                    return request.build_absolute_uri(url)
-                return url
-            
-            # Try product images (not linked to specific variant)
-            product_images = obj.variant.product.images.filter(variant__isnull=True)
-            if product_images.exists():
-                first_image = product_images.first()
-                if first_image.image and hasattr(first_image.image, 'url'):
-                    url = first_image.image.url
-                    if request:
-                        return request.build_absolute_uri(url)
-                    return url
-        
-        return None
+        """Image snapshotted at checkout (see checkout.place_order); no catalog lookups"""
+        return media_url(
+            obj.product_image, self.context.get('request'), storage=ProductImage._meta.get_field('image').storage
+        )
 
 
-class PaymentProofSerializer(serializers.ModelSerializer):
+class PaymentProofSerializer(MediaFieldsMixin, serializers.ModelSerializer):
     proof_file_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -285,12 +352,7 @@ class PaymentProofSerializer(serializers.ModelSerializer):
         fields = ('id', 'reference_id', 'proof_file', 'proof_file_url', 'notes', 'verified', 'created_at')
 
     def get_proof_file_url(self, obj):
-        if obj.proof_file and hasattr(obj.proof_file, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.proof_file.url)
-            return obj.proof_file.url
-        return None
+        return media_url(obj.proof_file, self.context.get('request'))
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -329,6 +391,8 @@ class OrderSerializer(serializers.ModelSerializer):
         return float(obj.total_amount)
 
     def get_user(self, obj):
+        if obj.user is None:
+            return None  # Guest checkout
         return {
             'id': obj.user.id,
             'username': obj.user.username,
@@ -338,6 +402,42 @@ class OrderSerializer(serializers.ModelSerializer):
         }
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """Slim order row for the admin order list (``?view=summary``): no line items or proof details"""
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    total_amount = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
+    has_payment_proof = serializers.BooleanField(read_only=True)
+    user = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = (
+            'id',
+            'order_number',
+            'status',
+            'status_display',
+            'name',
+            'email',
+            'phone_number',
+            'total_amount',
+            'upi_reference',
+            'payment_verified',
+            'created_at',
+            'item_count',
+            'has_payment_proof',
+            'user',
+        )
+
+    def get_total_amount(self, obj):
+        return float(obj.total_amount)
+
+    def get_user(self, obj):
+        if obj.user is None:
+            return None  # Guest checkout
+        return {'id': obj.user.id, 'username': obj.user.username, 'email': obj.user.email}
+
+
 class CheckoutSerializer(serializers.Serializer):
     shipping_address = serializers.CharField(required=False)  # Kept for backward compatibility
     # Separate address fields (all mandatory)
@@ -351,7 +451,18 @@ class CheckoutSerializer(serializers.Serializer):
     address = serializers.CharField(required=True)  # Full address field
 
 
-class PaymentProofSerializer(serializers.ModelSerializer):
+class OrderBulkUpdateSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ORDER_ACTIONS)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if attrs['action'] == 'status' and 'status' not in attrs:
+            raise serializers.ValidationError({'status': 'This field is required for the "status" action.'})
+        return attrs
+
+
+class PaymentProofSerializer(MediaFieldsMixin, serializers.ModelSerializer):
     proof_file_url = serializers.SerializerMethodField()
 
     class Meta:
@@ -360,15 +471,10 @@ class PaymentProofSerializer(serializers.ModelSerializer):
         read_only_fields = ('verified',)
 
     def get_proof_file_url(self, obj):
-        if obj.proof_file and hasattr(obj.proof_file, 'url'):
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.proof_file.url)
-            return obj.proof_file.url
-        return None
+        return media_url(obj.proof_file, self.context.get('request'))
 
 
-class SiteSettingsSerializer(serializers.ModelSerializer):
+class SiteSettingsSerializer(MediaFieldsMixin, serializers.ModelSerializer):
     logo_url = serializers.SerializerMethodField()
     homepage_banner_url = serializers.SerializerMethodField()
     qr_code_image_url = serializers.SerializerMethodField()
@@ -378,26 +484,11 @@ class SiteSettingsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def get_logo_url(self, obj):
-        request = self.context.get('request')
-        if obj.logo and hasattr(obj.logo, 'url'):
-            if request:
-                return request.build_absolute_uri(obj.logo.url)
-            return obj.logo.url
-        return None
+        return media_url(obj.logo, self.context.get('request'))
 
     def get_homepage_banner_url(self, obj):
-        request = self.context.get('request')
-        if obj.homepage_banner and hasattr(obj.homepage_banner, 'url'):
-            if request:
-                return request.build_absolute_uri(obj.homepage_banner.url)
-            return obj.homepage_banner.url
-        return None
+        return media_url(obj.homepage_banner, self.context.get('request'))
 
     def get_qr_code_image_url(self, obj):
-        request = self.context.get('request')
-        if obj.qr_code_image and hasattr(obj.qr_code_image, 'url'):
-            if request:
-                return request.build_absolute_uri(obj.qr_code_image.url)
-            return obj.qr_code_image.url
-        return None
+        return media_url(obj.qr_code_image, self.context.get('request'))
 
@@ -1,7 +1,12 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.contrib.auth.models import User
 from django.dispatch import receiver
 
+from .caching import bump_catalog_version
+from .catalog import schedule_catalog_refresh
+from .models import Category, Product, ProductVariant, ProductImage, ProductListing, Banner, SiteSettings, Order
+from .orders import invalidate_dashboard_stats
+
 
 @receiver(post_migrate)
 def create_default_superuser(sender, **kwargs):
@@ -26,3 +31,60 @@ def create_default_superuser(sender, **kwargs):
             user.save()
             print(f"[OK] Updated superuser password: {username}")
 
+
+
+# ProductListing and primary image maintenance, once per product per transaction
+# (see schedule_catalog_refresh). The refresh also bumps the 'products' version
+# of the catalog response cache (see shop/caching.py).
+
+@receiver(post_save, sender=Product)
+def refresh_listing_for_product(sender, instance, **kwargs):
+    schedule_catalog_refresh([instance.pk])
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_listing_for_child(sender, instance, **kwargs):
+    """Variant stock/price/color and image changes only rebuild their own product's rows"""
+    schedule_catalog_refresh([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+def refresh_listing_category(sender, instance, **kwargs):
+    ProductListing.objects.filter(category=instance).update(
+        category_name=instance.name,
+        category_slug=instance.slug,
+    )
+
+
+# Catalog cache versions that changes to the other catalog models invalidate
+CATALOG_SCOPES = {
+    Category: ('categories', 'products'),
+    Banner: ('banners',),
+    SiteSettings: ('settings',),
+}
+
+
+def invalidate_catalog_cache(sender, **kwargs):
+    """Bump the catalog cache versions so admin edits show up immediately, in every worker"""
+    bump_catalog_version(*CATALOG_SCOPES[sender])
+
+
+for model in CATALOG_SCOPES:
+    post_save.connect(invalidate_catalog_cache, sender=model, dispatch_uid=f'catalog_cache_save_{model.__name__}')
+    post_delete.connect(invalidate_catalog_cache, sender=model, dispatch_uid=f'catalog_cache_delete_{model.__name__}')
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_dashboard_for_order(sender, instance, **kwargs):
+    invalidate_dashboard_stats()
+
+
+@receiver(post_save, sender=User)
+def invalidate_dashboard_for_new_user(sender, instance, created, **kwargs):
+    if created:
+        invalidate_dashboard_stats()
+
@@ -48,6 +48,7 @@ urlpatterns = [
 
     # Admin orders
     path('orders/', views.AdminOrdersView.as_view()),
+    path('orders/bulk-update', views.AdminOrderBulkUpdateView.as_view()),
     path('orders/<int:pk>/', views.AdminOrderDetailView.as_view()),
     path('orders/<int:pk>/mark-paid', views.AdminMarkPaidView.as_view()),
     path('orders/<int:pk>/status', views.AdminOrderStatusView.as_view()),
@@ -55,6 +56,9 @@ urlpatterns = [
     # Admin bulk delete
     path('admin/bulk-delete', views.AdminBulkDeleteView.as_view()),
 
+    # Catalog cache stats
+    path('admin/cache-stats', views.CatalogCacheStatsView.as_view()),
+
     # Site Settings
     path('settings/', views.SiteSettingsView.as_view()),
     path('settings/update', views.SiteSettingsUpdateView.as_view()),
@@ -1,110 +1,112 @@
-from django.core.mail import send_mail
 from django.conf import settings
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
-from .models import Order
+from django.db import transaction
+from django.template.loader import get_template
+from .models import Order, PaymentProof, EmailOutbox
 
 
-def send_order_notification_to_admin(order):
-    """Send email to admin when customer confirms payment"""
-    try:
-        admin_email = settings.ADMIN_EMAIL
-        subject = f'New Order Payment Confirmation - Order #{order.order_number}'
-        
-        # Build order details
-        order_items = order.items.all()
-        items_html = '<ul>'
-        items_text = ''
-        for item in order_items:
-            items_html += f'<li>{item.product_title} ({item.size}, {item.color}) - ₹{item.price} x {item.quantity} = ₹{item.subtotal}</li>'
-            items_text += f'- {item.product_title} ({item.size}, {item.color}) - ₹{item.price} x {item.quantity} = ₹{item.subtotal}\n'
-        items_html += '</ul>'
-        
-        # Check if payment proof exists
-        payment_proof_text = ''
-        payment_proof_html = ''
-        if hasattr(order, 'payment_proof'):
-            proof = order.payment_proof
-            if proof.reference_id:
-                payment_proof_text = f'Reference ID: {proof.reference_id}\n'
-                payment_proof_html = f'<p><strong>Reference ID:</strong> {proof.reference_id}</p>'
-        
-        context = {
-            'order': order,
-            'order_number': order.order_number,
-            'customer_name': order.user.get_full_name() or order.user.username,
-            'customer_email': order.user.email,
-            'shipping_address': order.shipping_address,
-            'total_amount': order.total_amount,
-            'items_html': items_html,
-            'items_text': items_text,
-            'payment_proof_text': payment_proof_text,
-            'payment_proof_html': payment_proof_html,
-            'upi_reference': order.upi_reference or 'Not provided',
-        }
-        
-        html_message = render_to_string('emails/admin_order_notification.html', context)
-        plain_message = render_to_string('emails/admin_order_notification.txt', context)
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[admin_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending email to admin: {str(e)}")
-        return False
+def customer_name(order):
+    if order.user:
+        return order.user.get_full_name() or order.user.username
+    return order.name or 'Guest'
+
 
+def order_email_queryset():
+    """Orders with the user, payment proof and items the email templates read (two queries)"""
+    return Order.objects.select_related('user', 'payment_proof').prefetch_related('items')
 
-def send_order_confirmation_to_user(order):
-    """Send confirmation email to user when admin approves order"""
+
+def _payment_proof(order):
     try:
-        user_email = order.user.email
-        if not user_email:
-            return False
-        
-        subject = f'Order Placed Successfully - Order #{order.order_number}'
-        
-        # Build order details
-        order_items = order.items.all()
-        items_html = '<ul>'
-        items_text = ''
-        for item in order_items:
-            items_html += f'<li>{item.product_title} ({item.size}, {item.color}) - ₹{item.price} x {item.quantity} = ₹{item.subtotal}</li>'
-            items_text += f'- {item.product_title} ({item.size}, {item.color}) - ₹{item.price} x {item.quantity} = ₹{item.subtotal}\n'
-        items_html += '</ul>'
-        
-        context = {
-            'order': order,
-            'order_number': order.order_number,
-            'customer_name': order.user.get_full_name() or order.user.username,
-            'shipping_address': order.shipping_address,
-            'total_amount': order.total_amount,
-            'items_html': items_html,
-            'items_text': items_text,
-            'status': order.get_status_display(),
-        }
-        
-        html_message = render_to_string('emails/user_order_confirmation.html', context)
-        plain_message = render_to_string('emails/user_order_confirmation.txt', context)
-        
-        send_mail(
+        return order.payment_proof
+    except PaymentProof.DoesNotExist:
+        return None
+
+
+def admin_notification_email(order):
+    """Subject, context and recipients of the admin email sent when a customer confirms payment"""
+    context = {
+        'order': order,
+        'order_number': order.order_number,
+        'customer_name': customer_name(order),
+        'customer_email': order.user.email if order.user else order.email,
+        'shipping_address': order.shipping_address,
+        'total_amount': order.total_amount,
+        'items': order.items.all(),
+        'payment_proof': _payment_proof(order),
+        'upi_reference': order.upi_reference or 'Not provided',
+    }
+    return f'New Order Payment Confirmation - Order #{order.order_number}', context, [settings.ADMIN_EMAIL]
+
+
+def user_confirmation_email(order):
+    """Subject, context and recipients of the customer email sent when admin approves an order"""
+    # Guest orders have no user; use the email given at checkout
+    user_email = order.user.email if order.user else order.email
+    context = {
+        'order': order,
+        'order_number': order.order_number,
+        'customer_name': customer_name(order),
+        'shipping_address': order.shipping_address,
+        'total_amount': order.total_amount,
+        'items': order.items.all(),
+        'status': order.get_status_display(),
+    }
+    return f'Order Placed Successfully - Order #{order.order_number}', context, [user_email] if user_email else []
+
+
+ORDER_EMAILS = {
+    'admin_notification': ('emails/admin_order_notification', admin_notification_email),
+    'user_confirmation': ('emails/user_order_confirmation', user_confirmation_email),
+}
+
+
+def render_order_emails(kind, orders):
+    """
+    Render one ``kind`` email per order as EmailOutbox rows (unsaved).
+
+    ``orders`` should come from ``order_email_queryset()`` so nothing is
+    queried per order. Both templates are looked up once per batch; the
+    template engine's cached loader keeps them compiled between batches.
+    """
+    template_name, build = ORDER_EMAILS[kind]
+    html_template = get_template(f'{template_name}.html')
+    text_template = get_template(f'{template_name}.txt')
+    emails = []
+    for order in orders:
+        subject, context, recipients = build(order)
+        if not recipients:
+            continue
+        emails.append(EmailOutbox(
             subject=subject,
-            message=plain_message,
+            body=text_template.render(context),
+            html_body=html_template.render(context),
             from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user_email],
-            html_message=html_message,
-            fail_silently=False,
-        )
-        return True
-    except Exception as e:
-        print(f"Error sending email to user: {str(e)}")
-        return False
+            recipients=recipients,
+        ))
+    return emails
 
 
+def queue_order_emails(kind, orders):
+    """
+    Render and queue ``kind`` emails for many orders with one INSERT.
 
+    Call it in the same transaction as the change the emails report, so they
+    are sent if and only if that change is committed. The send_queued_emails
+    worker then delivers them over one SMTP connection per batch. Accepts
+    orders or order ids.
+    """
+    order_ids = [getattr(order, 'pk', order) for order in orders]
+    emails = render_order_emails(kind, order_email_queryset().filter(pk__in=order_ids))
+    # Savepoint: a failed insert must not break the caller's transaction
+    with transaction.atomic():
+        return EmailOutbox.objects.bulk_create(emails)
+
+
+def send_order_notification_to_admin(order):
+    """Queue an email to admin when customer confirms payment"""
+    try:
+        return bool(queue_order_emails('admin_notification', [order]))
+    except Exception as e:
+        print(f"Error queueing email to admin: {str(e)}")
+        return False
 
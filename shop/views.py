@@ -1,7 +1,9 @@
 from django.contrib.auth.models import User
 from django.shortcuts import get_object_or_404, redirect, render
 from django.conf import settings
-from django.db.models import Q, Max
+from django.utils import timezone
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q, Max, Prefetch, prefetch_related_objects
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
@@ -23,21 +25,54 @@ from .models import (
     Cart,
     CartItem,
     Order,
-    OrderItem,
     PaymentProof,
     SiteSettings,
+    LEGACY_ANONYMOUS_USERS,
+)
+from .pagination import (
+    paginated_response,
+    CreatedAtCursorPagination,
+    DateJoinedCursorPagination,
+    ProductListingCursorPagination,
+)
+from .utils import send_order_notification_to_admin
+from .middleware import get_guest_key, forget_guest_key
+from .carts import merge_carts
+from .checkout import place_order, out_of_stock_payload, EmptyCart, OutOfStock
+from .orders import mark_orders_paid, set_orders_status, cancel_orders
+from .images import build_renditions
+from .catalog import (
+    product_queryset,
+    listing_queryset,
+    sparse_listing_queryset,
+    card_queryset,
+    listing_rows_queryset,
+    serialize_listing_rows,
+    schedule_catalog_refresh,
+)
+from .caching import (
+    catalog_cached,
+    catalog_conditional,
+    catalog_cache_stats,
+    product_fingerprint,
+    category_fingerprint,
+    banner_fingerprint,
+    settings_fingerprint,
 )
-from .utils import send_order_notification_to_admin, send_order_confirmation_to_user
 from .serializers import (
     RegisterSerializer,
     UserSerializer,
     ProductSerializer,
+    ProductCardSerializer,
     CategorySerializer,
     BannerSerializer,
     CartSerializer,
     CartItemSerializer,
+    CartItemDeltaSerializer,
     OrderSerializer,
     CheckoutSerializer,
+    OrderBulkUpdateSerializer,
+    OrderSummarySerializer,
     PaymentProofSerializer,
     SiteSettingsSerializer,
 )
@@ -48,62 +83,122 @@ def get_user_cart(user):
     return cart
 
 
-def get_or_create_session_user(request):
-    """Get or create an anonymous user for session-based cart"""
+def cart_items_prefetch():
+    """Cart items with the variant, product and images CartSerializer reads"""
+    return Prefetch(
+        'items',
+        queryset=CartItem.objects.select_related('variant__product').prefetch_related(
+            'variant__images', 'variant__product__images'
+        ),
+    )
+
+
+def serialize_cart(cart, request):
+    """Serialize a cart in a fixed number of queries regardless of its size"""
+    prefetch_related_objects([cart], cart_items_prefetch())
+    return CartSerializer(cart, context={'request': request}).data
+
+
+def wants_cart_delta(request):
+    return request.query_params.get('view') == 'delta'
+
+
+def cart_mutation_response(cart, request, item=None, removed_item_id=None, status_code=status.HTTP_200_OK):
+    """
+    Response for a cart mutation: the full cart, or with ?view=delta only the
+    changed line, the new totals and the cart version (one aggregate query).
+    """
+    cart.bump_version()
+    if not wants_cart_delta(request):
+        return Response(serialize_cart(cart, request), status=status_code)
+    totals = cart.totals()
+    return Response({
+        'id': cart.id,
+        'version': cart.version,
+        'item': CartItemDeltaSerializer(item).data if item else None,
+        'removed_item_id': removed_item_id,
+        'total_items': totals['total_items'],
+        'total_amount': float(totals['total_amount']),
+    }, status=status_code)
+
+
+def order_queryset():
+    """Orders with the user, payment proof and items OrderSerializer reads (item images are snapshots)"""
+    return Order.objects.select_related('user', 'payment_proof').prefetch_related('items')
+
+
+def order_summary_queryset():
+    """Orders annotated for OrderSummarySerializer: one query, no prefetches"""
+    return Order.objects.select_related('user').annotate(
+        item_count=Count('items'),
+        has_payment_proof=Exists(PaymentProof.objects.filter(order=OuterRef('pk'))),
+    )
+
+
+def get_request_cart(request, create=True):
+    """
+    Cart of the signed-in user, or the guest cart behind the signed guest cookie.
+
+    Guests never get a User row. With ``create=False`` visitors without a cart
+    get None and nothing is written.
+    """
     if request.user.is_authenticated:
-        return request.user
-    
-    # Ensure session is created
-    if not request.session.session_key:
-        request.session.create()
-    
-    # Check if we have a session user ID
-    session_user_id = request.session.get('anonymous_user_id')
-    if session_user_id:
-        try:
-            user = User.objects.get(pk=session_user_id)
-            return user
-        except User.DoesNotExist:
-            # Session user was deleted, create a new one
-            pass
-    
-    # Create a new anonymous user
-    # Use session key if available, otherwise use timestamp
-    if request.session.session_key:
-        session_key_part = request.session.session_key[:8] if len(request.session.session_key) >= 8 else request.session.session_key
-    else:
-        import time
-        session_key_part = str(int(time.time()))[-8:]
-    
-    username = f'anonymous_{session_key_part}'
-    # Ensure username is unique
-    counter = 1
-    original_username = username
-    while User.objects.filter(username=username).exists():
-        username = f'{original_username}_{counter}'
-        counter += 1
-    
-    try:
-        user = User.objects.create_user(
-            username=username,
-            email=f'{username}@anonymous.local',
-            is_active=False  # Mark as inactive since it's anonymous
-        )
-        request.session['anonymous_user_id'] = user.id
-        request.session.save()  # Explicitly save the session
-        return user
-    except Exception as e:
-        # Fallback: try to get or create with a simpler approach
-        import uuid
-        username = f'anonymous_{uuid.uuid4().hex[:8]}'
-        user = User.objects.create_user(
-            username=username,
-            email=f'{username}@anonymous.local',
-            is_active=False
-        )
-        request.session['anonymous_user_id'] = user.id
-        request.session.save()
-        return user
+        if create:
+            return get_user_cart(request.user)
+        return Cart.objects.filter(user=request.user).first()
+    guest_key = get_guest_key(request, create=create)
+    if guest_key is None:
+        return None
+    if create:
+        cart, _ = Cart.objects.get_or_create(guest_key=guest_key)
+        return cart
+    return Cart.objects.filter(guest_key=guest_key).first()
+
+
+def request_orders_filter(request):
+    """Q matching the orders this visitor may see, or None if they have none"""
+    if request.user.is_authenticated:
+        return Q(user=request.user)
+    owners = []
+    guest_key = get_guest_key(request)
+    if guest_key:
+        owners.append(Q(guest_key=guest_key))
+    # Orders placed before guest carts existed belong to an inactive anonymous_* user
+    legacy_user_id = request.session.get('anonymous_user_id')
+    if legacy_user_id:
+        owners.append(Q(user_id=legacy_user_id, user__is_active=False))
+    if not owners:
+        return None
+    query = owners[0]
+    for owner in owners[1:]:
+        query |= owner
+    return query
+
+
+def merge_guest_cart(request, user):
+    """Merge the visitor's guest cart (and a legacy anonymous-user cart) into ``user``'s cart on login"""
+    owners = Q()
+    guest_key = get_guest_key(request)
+    if guest_key:
+        owners |= Q(guest_key=guest_key)
+    # Carts of inactive anonymous_* users from before guest carts existed
+    anonymous_user_id = request.session.get('anonymous_user_id')
+    if anonymous_user_id:
+        owners |= Q(user_id=anonymous_user_id, user__is_active=False)
+    if not owners:
+        return
+
+    source_carts = list(Cart.objects.filter(owners))
+    if source_carts:
+        merge_carts(source_carts, user)
+        Cart.objects.filter(pk__in=[cart.pk for cart in source_carts], user__isnull=True).delete()
+    if guest_key:
+        forget_guest_key(request)
+    if anonymous_user_id:
+        del request.session['anonymous_user_id']
+
+
+EMPTY_CART = {'id': None, 'version': 0, 'items': [], 'total_items': 0, 'total_amount': 0.0}
 
 
 class APIRootView(APIView):
@@ -164,6 +259,9 @@ class LoginView(TokenObtainPairView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request, *args, **kwargs):
+        import logging
+        logger = logging.getLogger(__name__)
+        user = None
         try:
             response = super().post(request, *args, **kwargs)
             if response.status_code == status.HTTP_200_OK:
@@ -178,14 +276,11 @@ class LoginView(TokenObtainPairView):
                         response.data['user'] = None
                 else:
                     response.data['user'] = None
-            return response
         except Exception as e:
             # Handle authentication errors more gracefully
             error_message = 'Invalid username or password. Please check your credentials and try again.'
             
             # Log error for debugging (but don't expose to client)
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Login error: {str(e)}")
             
             return Response(
@@ -195,140 +290,97 @@ class LoginView(TokenObtainPairView):
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
+        if user is not None:
+            # Move the guest cart into the account; a failed merge must not fail the login
+            try:
+                merge_guest_cart(request, user)
+            except Exception as e:
+                logger.error(f"Guest cart merge failed for user {user.pk}: {str(e)}")
+        return response
+
 
 class MeView(APIView):
     def get(self, request):
         return Response(UserSerializer(request.user).data)
 
 
+def requested_fields(request):
+    """Sparse fieldset from ?fields=a,b,c (None when not given)"""
+    raw = request.query_params.get('fields', '')
+    fields = [name.strip() for name in raw.split(',') if name.strip()]
+    return fields or None
+
+
+def product_list_cache_params(request):
+    """Query params that change the product list payload"""
+    gender = request.query_params.get('gender')
+    fields = requested_fields(request)
+    return {
+        'gender': gender if gender in dict(Product.Gender.choices) else None,
+        'expand_by_color': request.query_params.get('expand_by_color', 'false').lower() == 'true',
+        'view': request.query_params.get('view') == 'card',
+        'fields': ','.join(sorted(fields)) if fields else None,
+        'cursor': request.query_params.get('cursor'),
+        'page_size': request.query_params.get('page_size'),
+    }
+
+
 class ProductListView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @catalog_conditional('products', product_fingerprint, vary_on=product_list_cache_params)
+    @catalog_cached('products', product_fingerprint, vary_on=product_list_cache_params)
     def get(self, request):
         gender = request.query_params.get('gender')
         expand_by_color = request.query_params.get('expand_by_color', 'false').lower() == 'true'
+        card_view = request.query_params.get('view') == 'card'
+        fields = requested_fields(request)
         
-        queryset = Product.objects.filter(is_active=True).prefetch_related('variants', 'variants__images', 'images', 'category')
+        if expand_by_color:
+            # Denormalized rows (one per product/color) - a single indexed scan
+            queryset = listing_rows_queryset()
+        elif card_view:
+            queryset = card_queryset()
+        elif fields:
+            queryset = sparse_listing_queryset(fields)
+        else:
+            queryset = listing_queryset()
         if gender in dict(Product.Gender.choices):
             # Include products with matching gender OR UNISEX products
             queryset = queryset.filter(
                 Q(gender=gender) | Q(gender=Product.Gender.UNISEX)
             )
         
-        # If expand_by_color is true, return one entry per color variant
-        if expand_by_color:
-            expanded_products = []
-            for product in queryset:
-                # Get all unique colors for this product
-                unique_colors = product.variants.values_list('color', flat=True).distinct()
+        def serialize(products):
+            # If expand_by_color is true, return one entry per color variant
+            if expand_by_color:
+                expanded_products = serialize_listing_rows(products, request)
+                if fields:
+                    expanded_products = [
+                        {key: value for key, value in entry.items() if key in fields}
+                        for entry in expanded_products
+                    ]
                 
-                if not unique_colors:
-                    # No variants, show product as-is with base price
-                    expanded_products.append({
-                        'product_id': product.id,
-                        'title': product.title,
-                        'color': None,
-                        'price': float(product.base_price),
-                        'image_url': self._get_product_image_url(product, request),
-                        'category': {
-                            'id': product.category.id,
-                            'name': product.category.name,
-                            'slug': product.category.slug,
-                        },
-                        'slug': product.slug,
-                        'gender': product.gender,
-                        'has_stock': False,
-                    })
-                else:
-                    # Create one entry per color
-                    for color in unique_colors:
-                        # Get first variant with this color to determine price
-                        color_variant = product.variants.filter(color=color).first()
-                        price = float(color_variant.price) if color_variant else float(product.base_price)
-                        
-                        # Check if any variant of this color has stock
-                        has_stock = product.variants.filter(color=color, stock__gt=0).exists()
-                        
-                        # Get image for this color variant
-                        image_url = self._get_color_image_url(product, color, request)
-                        
-                        expanded_products.append({
-                            'product_id': product.id,
-                            'title': f"{product.title} - {color}",
-                            'base_title': product.title,  # Keep original title
-                            'color': color,
-                            'price': price,
-                            'image_url': image_url,
-                            'category': {
-                                'id': product.category.id,
-                                'name': product.category.name,
-                                'slug': product.category.slug,
-                            },
-                            'slug': product.slug,
-                            'gender': product.gender,
-                            'has_stock': has_stock,
-                        })
-            
-            # Debug logging
-            print(f"📦 Expanded products by color - Gender filter: {gender}, Total color variants: {len(expanded_products)}")
-            return Response(expanded_products)
-        else:
+                # Debug logging
+                print(f"📦 Expanded products by color - Gender filter: {gender}, Total color variants: {len(expanded_products)}")
+                return expanded_products
+            if card_view:
+                # Compact representation for listing grids
+                return ProductCardSerializer(products, many=True, fields=fields, context={'request': request}).data
             # Original behavior - return products as-is
-            serializer = ProductSerializer(queryset, many=True, context={'request': request})
-            return Response(serializer.data)
-    
-    def _get_product_image_url(self, product, request):
-        """Get product hero image or first product image"""
-        if product.hero_media and hasattr(product.hero_media, 'url'):
-            url = product.hero_media.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
-        
-        # Try product images (not linked to specific variant)
-        first_image = product.images.filter(variant__isnull=True).first()
-        if first_image and first_image.image and hasattr(first_image.image, 'url'):
-            url = first_image.image.url
-            if request:
-                return request.build_absolute_uri(url)
-            return url
+            return ProductSerializer(products, many=True, fields=fields, context={'request': request}).data
         
-        # Try first variant image if no product-level images
-        if product.variants.exists():
-            first_variant = product.variants.first()
-            variant_image = ProductImage.objects.filter(variant=first_variant, is_primary=True).first() or \
-                           ProductImage.objects.filter(variant=first_variant).first()
-            if variant_image and variant_image.image and hasattr(variant_image.image, 'url'):
-                url = variant_image.image.url
-                if request:
-                    return request.build_absolute_uri(url)
-                return url
-        
-        return None
-    
-    def _get_color_image_url(self, product, color, request):
-        """Get first image for a specific color variant"""
-        # Try to find variant-specific images
-        variant = product.variants.filter(color=color).first()
-        if variant:
-            # Get ProductImage objects linked to this variant
-            variant_image = ProductImage.objects.filter(variant=variant, is_primary=True).first() or \
-                           ProductImage.objects.filter(variant=variant).first()
-            if variant_image and variant_image.image and hasattr(variant_image.image, 'url'):
-                url = variant_image.image.url
-                if request:
-                    return request.build_absolute_uri(url)
-                return url
-        
-        # Fallback to product hero image or first product image
-        return self._get_product_image_url(product, request)
+        return paginated_response(
+            self, request, queryset, serialize,
+            pagination_class=ProductListingCursorPagination if expand_by_color else CreatedAtCursorPagination,
+        )
 
 
 class ProductDetailView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request, slug):
-        product = get_object_or_404(Product, slug=slug, is_active=True)
+        product = get_object_or_404(listing_queryset(), slug=slug)
         serializer = ProductSerializer(product, context={'request': request})
         return Response(serializer.data)
 
@@ -339,9 +391,9 @@ class ProductDetailByIdView(APIView):
     def get(self, request, pk):
         # Allow admin to see inactive products
         if request.user.is_staff:
-            product = get_object_or_404(Product, pk=pk)
+            product = get_object_or_404(product_queryset(), pk=pk)
         else:
-            product = get_object_or_404(Product, pk=pk, is_active=True)
+            product = get_object_or_404(listing_queryset(), pk=pk)
         serializer = ProductSerializer(product, context={'request': request})
         return Response(serializer.data)
 
@@ -391,36 +443,38 @@ class ProductCreateView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            product = serializer.save()
+            # One transaction: listings and primary images are refreshed once, on commit
+            with transaction.atomic():
+                product = serializer.save()
             
-            # Sync variants first (they contain price information)
-            created_variants_dict = self._sync_variants(product, request.data.get('variants'))
+                # Sync variants first (they contain price information)
+                created_variants_dict = self._sync_variants(product, request.data.get('variants'))
             
-            # Calculate base_price from first variant if not set
-            if not product.base_price or product.base_price == 0:
-                # Get first variant from created variants
-                first_variant = None
-                if created_variants_dict:
-                    # created_variants_dict is a dict by color, get first variant
-                    for color, variants_list in created_variants_dict.items():
-                        if variants_list:
-                            first_variant = variants_list[0]
-                            break
+                # Calculate base_price from first variant if not set
+                if not product.base_price or product.base_price == 0:
+                    # Get first variant from created variants
+                    first_variant = None
+                    if created_variants_dict:
+                        # created_variants_dict is a dict by color, get first variant
+                        for color, variants_list in created_variants_dict.items():
+                            if variants_list:
+                                first_variant = variants_list[0]
+                                break
                 
-                if first_variant:
-                    # Get price from first variant (use price_override or product.base_price)
-                    calculated_price = float(first_variant.price)
-                    if calculated_price > 0:
-                        product.base_price = calculated_price
-                        product.save(update_fields=['base_price'])
+                    if first_variant:
+                        # Get price from first variant (use price_override or product.base_price)
+                        calculated_price = float(first_variant.price)
+                        if calculated_price > 0:
+                            product.base_price = calculated_price
+                            product.save(update_fields=['base_price'])
             
-            # Ensure product is active
-            if not product.is_active:
-                product.is_active = True
-                product.save()
+                # Ensure product is active
+                if not product.is_active:
+                    product.is_active = True
+                    product.save()
             
-            # Handle multiple product images
-            self._sync_product_images(product, request.FILES)
+                # Handle multiple product images
+                self._sync_product_images(product, request.FILES)
             
             # Return full product data
             product_data = ProductSerializer(product, context={'request': request}).data
@@ -542,6 +596,7 @@ class ProductCreateView(APIView):
                     product=product,
                     variant=None,  # Product-level image
                     image=image_file,
+                    renditions=build_renditions(image_file, 'products/images/'),
                     display_order=idx,
                     is_primary=(idx == 0)
                 )
@@ -559,6 +614,7 @@ class ProductCreateView(APIView):
                             product=product,
                             variant=variant,
                             image=image_file,
+                            renditions=build_renditions(image_file, 'products/images/'),
                             display_order=idx,
                             is_primary=(idx == 0)
                         )
@@ -607,6 +663,7 @@ class ProductUpdateView(APIView):
                     product=product,
                     variant=None,  # Product-level image
                     image=image_file,
+                    renditions=build_renditions(image_file, 'products/images/'),
                     display_order=max_order + idx + 1,
                     is_primary=False  # Only set primary if it's the first image overall
                 )
@@ -627,12 +684,14 @@ class ProductUpdateView(APIView):
                             product=product,
                             variant=variant,
                             image=image_file,
+                            renditions=build_renditions(image_file, 'products/images/'),
                             display_order=variant_max_order + idx + 1,
                             is_primary=(idx == 0 and variant_max_order == -1)
                         )
                     except Exception as e:
                         print(f"Error creating ProductImage: {e}")
 
+    @transaction.atomic
     def put(self, request, pk):
         product = get_object_or_404(Product, pk=pk)
         serializer = ProductSerializer(product, data=request.data, partial=True)
@@ -679,7 +738,9 @@ class ProductUpdateView(APIView):
                     image_id = update.get('id')
                     display_order = update.get('display_order')
                     if image_id and display_order is not None:
-                        ProductImage.objects.filter(product=product, id=image_id).update(display_order=display_order)
+                        ProductImage.objects.filter(product=product, id=image_id).update(display_order=display_order, updated_at=timezone.now())
+                # queryset.update() does not send post_save
+                schedule_catalog_refresh([product.pk])
             except (json.JSONDecodeError, TypeError):
                 pass
         
@@ -695,10 +756,11 @@ class ProductDeleteView(APIView):
             product = get_object_or_404(Product, pk=pk)
             product_title = product.title
             # Delete related objects first (variants, images, etc.)
-            product.variants.all().delete()
-            if hasattr(product, 'images'):
-                product.images.all().delete()
-            product.delete()
+            with transaction.atomic():
+                product.variants.all().delete()
+                if hasattr(product, 'images'):
+                    product.images.all().delete()
+                product.delete()
             print(f"✅ Product deleted: {product_title} (ID: {pk})")
             return Response({'detail': 'Product deleted successfully'}, status=status.HTTP_200_OK)
         except Exception as e:
@@ -743,7 +805,9 @@ class ProductImageOrderView(APIView):
                 image_id = update.get('id')
                 display_order = update.get('display_order')
                 if image_id and display_order is not None:
-                    ProductImage.objects.filter(product=product, id=image_id).update(display_order=display_order)
+                    ProductImage.objects.filter(product=product, id=image_id).update(display_order=display_order, updated_at=timezone.now())
+            # queryset.update() does not send post_save
+            schedule_catalog_refresh([product.pk])
             
             product_data = ProductSerializer(product, context={'request': request}).data
             return Response(product_data, status=status.HTTP_200_OK)
@@ -757,6 +821,8 @@ class ProductImageOrderView(APIView):
 class CategoryListView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @catalog_conditional('categories', category_fingerprint)
+    @catalog_cached('categories', category_fingerprint)
     def get(self, request):
         serializer = CategorySerializer(Category.objects.all(), many=True)
         return Response(serializer.data)
@@ -791,6 +857,8 @@ class CategoryDetailView(APIView):
 class BannerListView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @catalog_conditional('banners', banner_fingerprint)
+    @catalog_cached('banners', banner_fingerprint)
     def get(self, request):
         serializer = BannerSerializer(Banner.objects.filter(is_active=True), many=True, context={'request': request})
         return Response(serializer.data)
@@ -827,7 +895,8 @@ class BannerUploadView(APIView):
             
             serializer = BannerSerializer(data=request.data, context={'request': request})
             serializer.is_valid(raise_exception=True)
-            banner = serializer.save()
+            # Grid-sized WebP/JPEG copies are made now so pages never load the full upload
+            banner = serializer.save(renditions=build_renditions(uploaded_file, 'banners/'))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         except Exception as e:
             return Response(
@@ -881,18 +950,18 @@ class CartView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        user = get_or_create_session_user(request)
-        cart = get_user_cart(user)
-        serializer = CartSerializer(cart, context={'request': request})
-        return Response(serializer.data)
+        cart = get_request_cart(request, create=False)
+        if cart is None:
+            # Browsing visitors without a cart cost no writes
+            return Response(EMPTY_CART)
+        return Response(serialize_cart(cart, request))
 
 
 class CartAddView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        user = get_or_create_session_user(request)
-        cart = get_user_cart(user)
+        cart = get_request_cart(request)
         serializer = CartItemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         variant = serializer.validated_data['variant']
@@ -900,41 +969,38 @@ class CartAddView(APIView):
         item, created = CartItem.objects.get_or_create(cart=cart, variant=variant)
         item.quantity = quantity if created else item.quantity + quantity
         item.save()
-        return Response(CartSerializer(cart, context={'request': request}).data, status=status.HTTP_201_CREATED)
+        return cart_mutation_response(cart, request, item=item, status_code=status.HTTP_201_CREATED)
 
 
 class CartUpdateView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def patch(self, request):
-        user = get_or_create_session_user(request)
-        cart = get_user_cart(user)
+        cart = get_request_cart(request, create=False)
         item_id = request.data.get('item_id')
         quantity = int(request.data.get('quantity', 1))
-        item = get_object_or_404(CartItem, pk=item_id, cart=cart)
+        item = get_object_or_404(CartItem.objects.select_related('variant__product'), pk=item_id, cart=cart)
         item.quantity = max(quantity, 1)
         item.save()
-        return Response(CartSerializer(cart, context={'request': request}).data)
+        return cart_mutation_response(cart, request, item=item)
 
 
 class CartRemoveView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def delete(self, request, pk):
-        user = get_or_create_session_user(request)
-        cart = get_user_cart(user)
+        cart = get_request_cart(request, create=False)
         item = get_object_or_404(CartItem, pk=pk, cart=cart)
         item.delete()
-        return Response(CartSerializer(cart, context={'request': request}).data)
+        return cart_mutation_response(cart, request, removed_item_id=pk)
 
 
 class CheckoutView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        user = get_or_create_session_user(request)
-        cart = get_user_cart(user)
-        if not cart.items.exists():
+        cart = get_request_cart(request, create=False)
+        if cart is None or not cart.items.exists():
             return Response({'detail': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = CheckoutSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -943,32 +1009,31 @@ class CheckoutView(APIView):
         validated_data = serializer.validated_data
         full_address = f"{validated_data.get('address', '')}\n{validated_data.get('street_name', '')}\n{validated_data.get('city_town', '')}, {validated_data.get('district', '')} - {validated_data.get('pin_code', '')}"
         
-        order = Order.objects.create(
-            user=user,
-            shipping_address=validated_data.get('shipping_address', full_address),
-            name=validated_data['name'],
-            email=validated_data['email'],
-            phone_number=validated_data['phone_number'],
-            pin_code=validated_data['pin_code'],
-            street_name=validated_data['street_name'],
-            city_town=validated_data['city_town'],
-            district=validated_data['district'],
-            address=validated_data['address'],
-            total_amount=cart.total_amount,
-        )
-        for item in cart.items.select_related('variant', 'variant__product'):
-            OrderItem.objects.create(
-                order=order,
-                variant=item.variant,
-                product_title=item.variant.product.title,
-                size=item.variant.size,
-                color=item.variant.color,
-                price=item.variant.price,
-                quantity=item.quantity,
+        try:
+            order = place_order(
+                cart,
+                shipping_address=validated_data.get('shipping_address', full_address),
+                name=validated_data['name'],
+                email=validated_data['email'],
+                phone_number=validated_data['phone_number'],
+                pin_code=validated_data['pin_code'],
+                street_name=validated_data['street_name'],
+                city_town=validated_data['city_town'],
+                district=validated_data['district'],
+                address=validated_data['address'],
             )
-            item.variant.stock = max(item.variant.stock - item.quantity, 0)
-            item.variant.save()
-        cart.items.all().delete()
+        except EmptyCart:
+            return Response({'detail': 'Cart is empty'}, status=status.HTTP_400_BAD_REQUEST)
+        except OutOfStock as exc:
+            return Response(
+                {
+                    'detail': 'Some items in your cart are no longer available in the requested quantity',
+                    'items': out_of_stock_payload(exc.items),
+                },
+                status=status.HTTP_409_CONFLICT,
+            )
+        # Reload with items and images prefetched so the response costs a fixed number of queries too
+        order = order_queryset().get(pk=order.pk)
         return Response(OrderSerializer(order).data, status=status.HTTP_201_CREATED)
 
 
@@ -976,7 +1041,9 @@ class ConfirmPaymentView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def post(self, request):
-        user = get_or_create_session_user(request)
+        owner = request_orders_filter(request)
+        if owner is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
         order_id = request.data.get('order')
         if isinstance(order_id, str):
             try:
@@ -984,7 +1051,7 @@ class ConfirmPaymentView(APIView):
             except ValueError:
                 return Response({'detail': 'Invalid order ID'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order = get_object_or_404(Order, pk=order_id, user=user)
+        order = get_object_or_404(Order.objects.filter(owner), pk=order_id)
         reference_id = request.data.get('reference_id', '')
         proof_file = request.FILES.get('proof_file')
         notes = request.data.get('notes', '')
@@ -996,21 +1063,22 @@ class ConfirmPaymentView(APIView):
         if not reference_id:
             return Response({'detail': 'UPI Reference ID is required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        order.upi_reference = reference_id
-        order.status = 'PAYMENT_PENDING'  # Set status to payment pending
-        order.save()
-        
-        proof, _ = PaymentProof.objects.update_or_create(
-            order=order,
-            defaults={
-                'reference_id': reference_id,
-                'proof_file': proof_file,
-                'notes': notes,
-            },
-        )
-        
-        # Send email notification to admin
-        send_order_notification_to_admin(order)
+        with transaction.atomic():
+            order.upi_reference = reference_id
+            order.status = 'PAYMENT_PENDING'  # Set status to payment pending
+            order.save()
+
+            proof, _ = PaymentProof.objects.update_or_create(
+                order=order,
+                defaults={
+                    'reference_id': reference_id,
+                    'proof_file': proof_file,
+                    'notes': notes,
+                },
+            )
+
+            # Queue email notification to admin (sent by the send_queued_emails worker)
+            send_order_notification_to_admin(order)
         
         return Response(OrderSerializer(order).data)
 
@@ -1019,26 +1087,36 @@ class MyOrdersView(APIView):
     permission_classes = [permissions.AllowAny]
 
     def get(self, request):
-        user = get_or_create_session_user(request)
-        orders = Order.objects.filter(user=user).order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        owner = request_orders_filter(request)
+        orders = order_queryset().filter(owner) if owner is not None else Order.objects.none()
+        orders = orders.order_by('-created_at')
+        return paginated_response(
+            self, request, orders, lambda page: OrderSerializer(page, many=True).data
+        )
 
 
 class AdminOrdersView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        orders = Order.objects.all().order_by('-created_at')
-        serializer = OrderSerializer(orders, many=True, context={'request': request})
-        return Response(serializer.data)
+        # ?view=summary: list rows without line items, for the admin order table
+        if request.query_params.get('view') == 'summary':
+            orders = order_summary_queryset().order_by('-created_at')
+            serializer_class = OrderSummarySerializer
+        else:
+            orders = order_queryset().order_by('-created_at')
+            serializer_class = OrderSerializer
+        return paginated_response(
+            self, request, orders,
+            lambda page: serializer_class(page, many=True, context={'request': request}).data,
+        )
 
 
 class AdminOrderDetailView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request, pk):
-        order = get_object_or_404(Order, pk=pk)
+        order = get_object_or_404(order_queryset(), pk=pk)
         serializer = OrderSerializer(order, context={'request': request})
         return Response(serializer.data)
 
@@ -1048,17 +1126,9 @@ class AdminMarkPaidView(APIView):
 
     def post(self, request, pk):
         order = get_object_or_404(Order, pk=pk)
-        order.payment_verified = True
-        order.status = 'PLACED'  # Mark order as placed when admin approves
-        order.save()
-        if hasattr(order, 'payment_proof'):
-            proof = order.payment_proof
-            proof.verified = True
-            proof.save()
-        
-        # Send confirmation email to user
-        send_order_confirmation_to_user(order)
-        
+        # Marks the order placed and queues the confirmation email to the user
+        mark_orders_paid([order.pk])
+        order.refresh_from_db()
         return Response(OrderSerializer(order).data)
 
 
@@ -1070,29 +1140,65 @@ class AdminOrderStatusView(APIView):
         if status_value not in dict(Order.STATUS_CHOICES):
             return Response({'detail': 'Invalid status'}, status=status.HTTP_400_BAD_REQUEST)
         order = get_object_or_404(Order, pk=pk)
-        order.status = status_value
-        order.save()
+        set_orders_status([order.pk], status_value)
+        order.refresh_from_db()
         return Response(OrderSerializer(order).data)
 
 
+class AdminOrderBulkUpdateView(APIView):
+    """
+    Apply one action to many orders: {"action": "mark_paid" | "status" | "cancel", "ids": [...]}
+    ("status" also takes "status"). Returns the outcome for every requested id.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request):
+        serializer = OrderBulkUpdateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action = serializer.validated_data['action']
+        ids = serializer.validated_data['ids']
+        if action == 'mark_paid':
+            results = mark_orders_paid(ids)
+        elif action == 'status':
+            results = set_orders_status(ids, serializer.validated_data['status'])
+        else:
+            results = cancel_orders(ids)
+        return Response({
+            'updated_count': sum(1 for item in results if item['result'] == 'updated'),
+            'results': results,
+        })
+
+
 class AdminUsersView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def get(self, request):
-        users = User.objects.all().order_by('-date_joined')
-        serializer = UserSerializer(users, many=True)
-        return Response(serializer.data)
+        users = User.objects.exclude(LEGACY_ANONYMOUS_USERS).order_by('-date_joined')
+        return paginated_response(
+            self, request, users, lambda page: UserSerializer(page, many=True).data,
+            pagination_class=DateJoinedCursorPagination,
+        )
 
 
 class SiteSettingsView(APIView):
     permission_classes = [permissions.AllowAny]
 
+    @catalog_conditional('settings', settings_fingerprint)
+    @catalog_cached('settings', settings_fingerprint)
     def get(self, request):
         settings = SiteSettings.load()
         serializer = SiteSettingsSerializer(settings, context={'request': request})
         return Response(serializer.data)
 
 
+class CatalogCacheStatsView(APIView):
+    """Hit/miss counters of the catalog response cache (per process with the local-memory backend)"""
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(catalog_cache_stats())
+
+
 class SiteSettingsUpdateView(APIView):
     permission_classes = [permissions.IsAdminUser]
 
@@ -1126,28 +1232,8 @@ def user_login_view(request):
         if user is not None:
             login(request, user)
             
-            # Transfer cart from anonymous user if exists
-            anonymous_user_id = request.session.get('anonymous_user_id')
-            if anonymous_user_id:
-                try:
-                    anonymous_user = User.objects.get(pk=anonymous_user_id, is_active=False)
-                    anonymous_cart = get_user_cart(anonymous_user)
-                    user_cart = get_user_cart(user)
-                    
-                    # Transfer cart items
-                    for item in anonymous_cart.items.all():
-                        existing_item = user_cart.items.filter(variant=item.variant).first()
-                        if existing_item:
-                            existing_item.quantity += item.quantity
-                            existing_item.save()
-                        else:
-                            item.cart = user_cart
-                            item.save()
-                    
-                    anonymous_cart.items.all().delete()
-                    del request.session['anonymous_user_id']
-                except User.DoesNotExist:
-                    pass
+            # Move the guest cart into the account
+            merge_guest_cart(request, user)
             
             # Generate JWT tokens for frontend API calls
             refresh = RefreshToken.for_user(user)
@@ -1234,28 +1320,8 @@ def user_signup_view(request):
             )
             login(request, user)
             
-            # Transfer cart from anonymous user if exists
-            anonymous_user_id = request.session.get('anonymous_user_id')
-            if anonymous_user_id:
-                try:
-                    anonymous_user = User.objects.get(pk=anonymous_user_id, is_active=False)
-                    anonymous_cart = get_user_cart(anonymous_user)
-                    user_cart = get_user_cart(user)
-                    
-                    # Transfer cart items
-                    for item in anonymous_cart.items.all():
-                        existing_item = user_cart.items.filter(variant=item.variant).first()
-                        if existing_item:
-                            existing_item.quantity += item.quantity
-                            existing_item.save()
-                        else:
-                            item.cart = user_cart
-                            item.save()
-                    
-                    anonymous_cart.items.all().delete()
-                    del request.session['anonymous_user_id']
-                except User.DoesNotExist:
-                    pass
+            # Move the guest cart into the account
+            merge_guest_cart(request, user)
             
             messages.success(request, 'Account created successfully!')
             
@@ -56,6 +56,14 @@ python manage.py migrate --noinput || {
 }
 echo "✅ Migrations complete!"
 
+# Rebuild the denormalized product listing (kept current by signals afterwards)
+echo "🗂️  Rebuilding product listings..."
+python manage.py rebuild_product_listings || echo "⚠️  Product listing rebuild failed, but continuing..."
+
+# Snapshot product images onto order lines placed before they were recorded (no-op once done)
+echo "🖼️  Backfilling order item images..."
+python manage.py backfill_order_item_images || echo "⚠️  Order item image backfill failed, but continuing..."
+
 # Ensure admin user exists (create or reset if needed)
 echo "👤 Ensuring admin user exists..."
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_EMAIL" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ]; then